@@ -0,0 +1,118 @@
+"""Measure DelayQueue with many pending timers and heavy cancel/reschedule churn."""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import ntelebot
+
+SPAN = 86400
+
+
+def _timed(label, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f'  {label:<38} {elapsed:8.3f}s  {count / elapsed:12,.0f}/s')
+
+
+def _queue(pending, churn):
+    """Schedule timers through DelayQueue, churn them, then pull them all back out."""
+
+    rand = random.Random(0)
+    queue = ntelebot.delayqueue.DelayQueue()
+    far = time.time() + SPAN
+    timers = []
+
+    def _fill():
+        for i in range(pending):
+            timers.append(queue.putwhen(far + rand.random() * SPAN, i))
+        # Let get() move everything from the incoming queue into the engine.
+        queue.put(None)
+        queue.get()
+
+    def _churn():
+        for _ in range(churn):
+            i = rand.randrange(pending)
+            if rand.random() < .5:
+                timers[i].reschedule(far + rand.random() * SPAN)
+            elif timers[i].cancel():
+                timers[i] = queue.putwhen(far + rand.random() * SPAN, i)
+
+    def _drain():
+        for timer in timers:
+            timer.reschedule(0)
+        for _ in range(pending):
+            queue.get()
+
+    _timed(f'putwhen x {pending:,}', _fill, pending)
+    _timed(f'cancel/reschedule x {churn:,}', _churn, churn)
+    print(f'  {"records held after churn":<38} {len(queue.heap) + len(queue.queue):,} '
+          f'for {pending:,} live')
+    _timed(f'reschedule to now + get x {pending:,}', _drain, pending)
+
+
+def _persistent(pending):
+    """Measure PersistentDelayQueue's logging overhead and how quickly it restores from its log."""
+
+    rand = random.Random(0)
+    far = time.time() + SPAN
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'queue.log')
+        queue = ntelebot.delayqueue.PersistentDelayQueue(path)
+
+        def _fill():
+            for i in range(pending):
+                queue.putwhen(far + rand.random() * SPAN, {'chat_id': i, 'text': 'reminder'})
+
+        def _restore():
+            ntelebot.delayqueue.PersistentDelayQueue(path).close()
+
+        _timed(f'putwhen x {pending:,}', _fill, pending)
+        queue.close()
+        print(f'  {"log size":<38} {os.path.getsize(path) / pending:8.1f} bytes/record')
+        _timed(f'restore x {pending:,}', _restore, pending)
+
+
+def _async(pending):
+    """Schedule many items on an AsyncDelayQueue and drain them as they come due."""
+
+    rand = random.Random(0)
+
+    async def _run():
+        queue = ntelebot.delayqueue.AsyncDelayQueue()
+
+        def _fill():
+            for i in range(pending):
+                queue.putafter(rand.random(), i)
+
+        _timed(f'putafter x {pending:,}', _fill, pending)
+        start = time.perf_counter()
+        received = 0
+        while received < pending:
+            received += len(await queue.get_due())
+        elapsed = time.perf_counter() - start
+        print(f'  {f"get_due x {pending:,} (spread over 1s)":<38} {elapsed:8.3f}s')
+
+    asyncio.run(_run())
+
+
+def main(argv):  # pylint: disable=missing-docstring
+    pending = int(argv[1]) if len(argv) > 1 else 1000000
+    churn = int(argv[2]) if len(argv) > 2 else pending
+
+    print('queue:')
+    _queue(pending, churn)
+
+    print('persistent:')
+    _persistent(pending)
+
+    print('async:')
+    _async(pending)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
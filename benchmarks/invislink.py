@@ -0,0 +1,90 @@
+"""Compare the legacy and compact invislink encodings on realistic payloads."""
+
+import random
+import sys
+import time
+
+import ntelebot
+
+# pylint: disable=protected-access
+FORMATS = {
+    'legacy': (ntelebot.invislink._encode_json, ntelebot.invislink._decode_json),
+    'compact': (ntelebot.invislink._encode_compact,
+                lambda text: ntelebot.invislink._decode_compact(text[1:])),
+    'encode': (ntelebot.invislink._encode_meta, ntelebot.invislink._decode_meta),
+}
+BTN_FORMATS = {
+    'legacy': (ntelebot.invislink._encode_list, ntelebot.invislink._decode_list),
+    'compact': (ntelebot.invislink._encode_btn, ntelebot.invislink._decode_btn),
+}
+# pylint: enable=protected-access
+
+
+def _payloads():
+    rand = random.Random(0)
+    return {
+        'small meta': {
+            'page': 2
+        },
+        'menu meta': {
+            'chat': -1001000000000 - rand.getrandbits(32),
+            'user': rand.getrandbits(33),
+            'page': 3,
+            'sort': 'date',
+            'query': 'weekly meetup',
+        },
+        'form meta': {
+            'field': 'description',
+            'event': {
+                'title': 'Weekly meetup • Downtown',
+                'start': 1700000000 + rand.getrandbits(20),
+                'end': 1700007200 + rand.getrandbits(20),
+                'location': '123 Main St., Springfield',
+                'tags': ['social', 'outdoors', 'family'],
+                'confirmed': True,
+                'capacity': None,
+            },
+        },
+        'list meta': {
+            'ids': [rand.getrandbits(40) for _ in range(40)]
+        },
+    }
+
+
+def _btn():
+    rand = random.Random(0)
+    groups = [
+        f'/admin {rand.getrandbits(64):x} groups -100{rand.getrandbits(40)} ' for _ in range(4)
+    ]
+    return {
+        'btn (4 prefixes)': [f'{group}events {"x" * 10}' for group in groups],
+        'btn (32 prefixes)': [f'{rand.choice(groups)}events {i:02} {"x" * 10}' for i in range(32)],
+    }
+
+
+def _measure(label, formats, value, repeat):
+    print(f'{label}:')
+    for name, (encode, decode) in formats.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            text = encode(value)
+        encoded = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            assert decode(text) == value
+        decoded = (time.perf_counter() - start) / repeat
+        print(f'  {name:<8} {len(text):6,} bytes  encode {encoded * 1e6:8.2f}us  '
+              f'decode {decoded * 1e6:8.2f}us')
+
+
+def main(argv):  # pylint: disable=missing-docstring
+    repeat = int(argv[1]) if len(argv) > 1 else 10000
+
+    for label, value in _payloads().items():
+        _measure(label, FORMATS, value, repeat)
+    for label, value in _btn().items():
+        _measure(label, BTN_FORMATS, value, repeat)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,101 @@
+"""Compare callback_data shortening strategies on large keyboards."""
+
+import random
+import sys
+import time
+
+import ntelebot
+
+
+def _scan(lines, maxlen):
+    """The original shorten_lines, which compares each line against every prefix chosen so far."""
+
+    prefixes = []
+    mapping = {}
+    for line in sorted(lines, key=lambda line: -len(line)):
+        if len(line) <= maxlen:
+            break
+        for i, prefix in enumerate(prefixes):
+            if line.startswith(prefix):
+                break
+        else:
+            i = len(prefixes)
+            prefix = line[:-(maxlen - len(f'\0{i}\0'))]
+            prefixes.append(prefix)
+        mapping[line] = f'\0{i}\0{line[len(prefix):]}'
+    return prefixes, mapping
+
+
+def _trie(lines, maxlen):
+    """Match lines against a character-by-character trie of the prefixes chosen so far."""
+
+    prefixes = []
+    mapping = {}
+    trie = {}
+    for line in sorted(lines, key=lambda line: -len(line)):
+        if len(line) <= maxlen:
+            break
+        i = cut = None
+        node = trie
+        for depth, char in enumerate(line, 1):
+            if (node := node.get(char)) is None:
+                break
+            if '' in node:
+                i, cut = node[''], depth
+        if i is None:
+            i = len(prefixes)
+            prefix = line[:-(maxlen - len(f'\0{i}\0'))]
+            prefixes.append(prefix)
+            cut = len(prefix)
+            node = trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[''] = i
+        mapping[line] = f'\0{i}\0{line[cut:]}'
+    return prefixes, mapping
+
+
+STRATEGIES = {
+    'scan': _scan,
+    'trie': _trie,
+    'dict': ntelebot.keyboardutil.shorten_lines,
+}
+
+
+def _keyboard(buttons, groups):
+    """Build callback_data like a settings menu: many long commands sharing a few long stems."""
+
+    rand = random.Random(0)
+    stems = [
+        f'/admin {rand.getrandbits(64):x} groups -100{rand.getrandbits(40)} events {"x" * 20}{g}'
+        for g in range(groups)
+    ]
+    return [
+        f'{rand.choice(stems)} {rand.getrandbits(32):x} {"field" * rand.randrange(1, 4)}'
+        for _ in range(buttons)
+    ]
+
+
+def _measure(name, func, lines, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        prefixes, mapping = func(lines, 64)
+    elapsed = (time.perf_counter() - start) / repeat
+    link = ntelebot.invislink.encode(prefixes, None)
+    data = sum(len(encoded) for encoded in mapping.values())
+    print(f'  {name:<6} {elapsed * 1000:9.3f}ms  {len(prefixes):6,} prefixes  '
+          f'{len(link):8,} link bytes  {data:9,} callback_data bytes')
+
+
+def main(argv):  # pylint: disable=missing-docstring
+    repeat = int(argv[1]) if len(argv) > 1 else 10
+
+    for buttons, groups in ((100, 5), (1000, 20), (5000, 200), (20000, 2000)):
+        lines = _keyboard(buttons, groups)
+        print(f'{buttons:,} buttons, {groups:,} stems:')
+        for name, func in STRATEGIES.items():
+            _measure(name, func, lines, repeat)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,59 @@
+"""Load-test Loop, Bot, and Context end to end against a local FakeServer."""
+
+import sys
+import threading
+import time
+
+import ntelebot
+import ntelebot.fakeserver
+
+
+def _updates(count):
+    for i in range(1, count + 1):
+        user = {'id': 1000 + i % 50}
+        yield {
+            'message': {
+                'message_id': i,
+                'chat': dict(user, type='private'),
+                'from': user,
+                'text': f'/echo {i}',
+            },
+        }
+
+
+def _run(bots, updates, latency):
+    with ntelebot.fakeserver.FakeServer(latency=latency) as server:
+        dispatcher = ntelebot.dispatch.LoopDispatcher()
+        dispatcher.add_command('echo', lambda ctx: ctx.reply_text(ctx.text))
+        loop = ntelebot.loop.Loop()
+        for i in range(bots):
+            bot = ntelebot.bot.Bot(f'{i + 1}:fake',
+                                   username=f'fake{i + 1}bot',
+                                   base_url=server.base_url)
+            server.feed(bot.token, _updates(updates))
+            loop.add(bot, dispatcher)
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=loop.run, daemon=True)
+        thread.start()
+        total = bots * updates
+        while server.requests['sendmessage'] < total:
+            time.sleep(.01)
+        elapsed = time.perf_counter() - start
+        loop.stop()
+        thread.join()
+        print(f'  {bots:4,} bots x {updates:6,} updates, {latency * 1000:4.0f}ms latency: '
+              f'{elapsed:8.3f}s  {total / elapsed:10,.0f} updates/s  '
+              f'({server.requests["getupdates"]:,} polls)')
+
+
+def main(argv):  # pylint: disable=missing-docstring
+    updates = int(argv[1]) if len(argv) > 1 else 2000
+
+    print('echo (getUpdates -> Preprocessor -> Dispatcher -> Context.reply_text -> sendMessage):')
+    for bots, latency in ((1, 0), (10, 0), (100, 0), (10, .01)):
+        _run(bots, updates // bots, latency)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
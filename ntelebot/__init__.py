@@ -1,10 +1,17 @@
 """A simple implementation of https://core.telegram.org/bots/api."""
 
 # pylint: disable=cyclic-import
+from ntelebot import autodelete
+from ntelebot import batcher
 from ntelebot import bot
+from ntelebot import broadcast
+from ntelebot import cache
+from ntelebot import callbackstore
+from ntelebot import checkpoint
 from ntelebot import delayqueue
 from ntelebot import deeplink
 from ntelebot import dispatch
+from ntelebot import editmanager
 from ntelebot import errors
 from ntelebot import invislink
 from ntelebot import keyboardutil
@@ -12,3 +19,5 @@ from ntelebot import limits
 from ntelebot import loop
 from ntelebot import preprocess
 from ntelebot import requests
+from ntelebot import scheduler
+from ntelebot import supervisor
@@ -0,0 +1,129 @@
+"""Delete messages after a delay, batched per chat into deleteMessages calls."""
+
+import logging
+import math
+import threading
+import time
+
+import ntelebot
+
+
+class AutoDelete:  # pylint: disable=too-many-instance-attributes
+    """Delete messages after a delay, batched per chat into deleteMessages calls.
+
+    Deadlines are rounded up to the next multiple of granularity seconds, so all messages scheduled
+    for the same chat within that window are deleted by a single call (of up to
+    ntelebot.limits.bulk_message_ids_max ids).
+
+    If path is given, pending deletions are logged there (by an
+    ntelebot.delayqueue.PersistentDelayQueue, so each one costs an appended line rather than a
+    rewrite) and picked back up by the next AutoDelete created with the same path. Only bot ids are
+    saved, not tokens: restored deletions are carried out by the Bot most recently passed to add
+    with the same id, or else the one returned by resolve(bot_id), or dropped if there is neither.
+
+    Deletions are timed by scheduler (default the shared ntelebot.scheduler), but sent by executor
+    (default ntelebot.scheduler.shared_executor()), so a slow call doesn't hold up the scheduler's
+    other callbacks.
+    """
+
+    def __init__(self, path=None, granularity=5, scheduler=None, *, resolve=None, executor=None):
+        # pylint: disable=too-many-arguments
+        self.path = path
+        self.granularity = granularity
+        self.scheduler = scheduler or ntelebot.scheduler.shared()
+        self.executor = executor or ntelebot.scheduler.shared_executor()
+        self.resolve = resolve
+        self.bots = {}
+        self.pending = {}
+        self._timers = {}
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        self.log = None
+        if path:
+            self.log = ntelebot.delayqueue.PersistentDelayQueue(path)
+            self._load()
+
+    def close(self):
+        """Close the log at path (if any)."""
+
+        if self.log:
+            self.log.close()
+
+    def add(self, bot, chat_id, message_id, delay=60):
+        """Delete the given message after delay seconds."""
+
+        when = time.time() + delay
+        if self.granularity:
+            when = math.ceil(when / self.granularity) * self.granularity
+        bot_id = bot.token.split(':', 1)[0]
+        with self._lock:
+            self.bots[bot_id] = bot
+            self.pending.setdefault((bot_id, chat_id), {})[message_id] = when
+            if self.log:
+                key = (bot_id, chat_id, message_id)
+                if (timer := self._timers.pop(key, None)):
+                    timer.cancel()
+                self._timers[key] = self.log.putwhen(when, list(key))
+            self._schedule(bot_id, chat_id, when)
+
+    def _schedule(self, bot_id, chat_id, when):
+        if (bot_id, chat_id, when) not in self._scheduled:
+            self._scheduled.add((bot_id, chat_id, when))
+            self.scheduler.call_at(when, self.executor.submit, self._flush, bot_id, chat_id, when)
+
+    def _flush(self, bot_id, chat_id, when):
+        now = time.time()
+        with self._lock:
+            self._scheduled.discard((bot_id, chat_id, when))
+            messages = self.pending.get((bot_id, chat_id), {})
+            due = sorted(message_id for message_id, deadline in messages.items() if deadline <= now)
+            if not due:
+                return
+            for message_id in due:
+                del messages[message_id]
+                if (timer := self._timers.pop((bot_id, chat_id, message_id), None)):
+                    timer.cancel()
+            if not messages:
+                del self.pending[bot_id, chat_id]
+            bot = self.bots.get(bot_id)
+
+        if bot is None and self.resolve:
+            bot = self.resolve(bot_id)
+            if bot is not None:
+                with self._lock:
+                    bot = self.bots.setdefault(bot_id, bot)
+        if bot is None:
+            logging.warning('Unable to delete %r from %r: no bot with id %r.', due, chat_id, bot_id)
+            return
+
+        batch = ntelebot.limits.bulk_message_ids_max
+        for i in range(0, len(due), batch):
+            try:
+                bot.delete_messages(chat_id=chat_id, message_ids=due[i:i + batch])
+            except ntelebot.errors.Error as e:
+                logging.info('Unable to delete %r from %r: %r', due[i:i + batch], chat_id, e)
+
+    def _load(self):
+        # Nothing is ever taken from the log's queue, so everything it restored is still waiting
+        # there.
+        with self._lock:
+            for record in list(self.log.queue):
+                when, _, key = record
+                bot_id, chat_id, message_id = key = tuple(key)
+                self.pending.setdefault((bot_id, chat_id), {})[message_id] = when
+                self._timers[key] = ntelebot.delayqueue.Timer(self.log, record)
+                self._schedule(bot_id, chat_id, when)
+
+
+_SHARED = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared():
+    """Return the process-wide AutoDelete, creating it if necessary."""
+
+    global _SHARED  # pylint: disable=global-statement
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = AutoDelete()
+        return _SHARED
@@ -0,0 +1,137 @@
+"""Collect single-message deletes, forwards, and copies into Telegram's bulk methods."""
+
+import concurrent.futures
+import logging
+import threading
+
+import ntelebot
+
+
+class Batcher:
+    """Collect single-message deletes, forwards, and copies into Telegram's bulk methods.
+
+    Calls for the same chat (and, for forwards and copies, the same source chat and options) made
+    within window seconds of each other are sent as a single deleteMessages, forwardMessages, or
+    copyMessages of up to ntelebot.limits.bulk_message_ids_max ids. Each call returns a
+    concurrent.futures.Future for its own result: True for deletes, and a MessageId for forwards and
+    copies (or None if Telegram skipped some of the batch, so results can't be matched up).
+
+    If a bulk call fails, its messages are retried one at a time, so each Future gets its own
+    result or error.
+
+    Batches are timed by scheduler (default the shared ntelebot.scheduler), but sent by executor
+    (default ntelebot.scheduler.shared_executor()), so a slow call doesn't hold up the scheduler's
+    other callbacks.
+    """
+
+    # Options the bulk methods accept. Calls using any others are sent individually.
+    BULK_KWARGS = {
+        'copy': {'disable_notification', 'message_thread_id', 'protect_content', 'remove_caption'},
+        'forward': {'disable_notification', 'message_thread_id', 'protect_content'},
+    }
+
+    def __init__(self, bot, window=.05, scheduler=None, *, executor=None):
+        self.bot = bot
+        self.window = window
+        self.scheduler = scheduler or ntelebot.scheduler.shared()
+        self.executor = executor or ntelebot.scheduler.shared_executor()
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def delete_message(self, chat_id, message_id):
+        """Delete the given message as part of the next deleteMessages for chat_id."""
+
+        return self._add(('delete', chat_id, None, ()), message_id)
+
+    def forward_message(self, chat_id, from_chat_id, message_id, **kwargs):
+        """Forward the given message as part of the next matching forwardMessages."""
+
+        return self._add_or_send('forward', chat_id, from_chat_id, message_id, kwargs)
+
+    def copy_message(self, chat_id, from_chat_id, message_id, **kwargs):
+        """Copy the given message as part of the next matching copyMessages."""
+
+        return self._add_or_send('copy', chat_id, from_chat_id, message_id, kwargs)
+
+    def _add_or_send(self, kind, chat_id, from_chat_id, message_id, kwargs):
+        # pylint: disable=too-many-arguments
+        if not kwargs.keys() <= self.BULK_KWARGS[kind]:
+            future = concurrent.futures.Future()
+            _resolve(future, self._send_one, kind, chat_id, from_chat_id, message_id, kwargs)
+            return future
+        return self._add((kind, chat_id, from_chat_id, tuple(sorted(kwargs.items()))), message_id)
+
+    def _add(self, key, message_id):
+        future = concurrent.futures.Future()
+        with self._lock:
+            batch = self.pending.get(key)
+            # Bulk methods need distinct ids, so a second forward or copy of the same message starts
+            # a new batch (leaving the current one to be sent on schedule). Duplicate deletes just
+            # share the first's result.
+            if batch is not None and message_id in batch and key[0] != 'delete':
+                del self.pending[key]
+                batch = None
+            if batch is None:
+                batch = self.pending[key] = {}
+                self.scheduler.call_later(self.window, self.executor.submit, self._flush, key,
+                                          batch)
+            batch.setdefault(message_id, []).append(future)
+            if len(batch) >= ntelebot.limits.bulk_message_ids_max:
+                # Full: later calls start a new batch.
+                del self.pending[key]
+        return future
+
+    def _flush(self, key, batch):
+        with self._lock:
+            if self.pending.get(key) is batch:
+                del self.pending[key]
+        kind, chat_id, from_chat_id, kwargs = key
+        kwargs = dict(kwargs)
+        message_ids = sorted(batch)
+        try:
+            if kind == 'delete':
+                self.bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+                results = [True] * len(message_ids)
+            else:
+                method = getattr(self.bot, f'{kind}_messages')
+                results = method(chat_id=chat_id,
+                                 from_chat_id=from_chat_id,
+                                 message_ids=message_ids,
+                                 **kwargs)
+                if len(results) != len(message_ids):
+                    logging.info('Telegram skipped %s of %r; unable to match up results.',
+                                 len(message_ids) - len(results), message_ids)
+                    results = [None] * len(message_ids)
+        except ntelebot.errors.Error as e:
+            logging.info('Bulk %s of %r failed (%r); retrying individually.', kind, message_ids, e)
+            for message_id in message_ids:
+                for future in batch[message_id]:
+                    _resolve(future, self._send_one, kind, chat_id, from_chat_id, message_id,
+                             kwargs)
+            return
+        except Exception as e:  # pylint: disable=broad-except
+            # E.g. a transport error: retrying each message individually would likely fail too.
+            for futures in batch.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for message_id, result in zip(message_ids, results):
+            for future in batch[message_id]:
+                future.set_result(result)
+
+    def _send_one(self, kind, chat_id, from_chat_id, message_id, kwargs):
+        # pylint: disable=too-many-arguments
+        if kind == 'delete':
+            return self.bot.delete_message(chat_id=chat_id, message_id=message_id)
+        method = getattr(self.bot, f'{kind}_message')
+        result = method(chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id, **kwargs)
+        # forwardMessage returns a full Message, while the bulk methods (and copyMessage) return
+        # just a MessageId.
+        return {'message_id': result['message_id']}
+
+
+def _resolve(future, func, *args):
+    try:
+        future.set_result(func(*args))
+    except Exception as e:  # pylint: disable=broad-except
+        future.set_exception(e)
@@ -1,26 +1,75 @@
 """A simple implementation of https://core.telegram.org/bots/api."""
 
+import concurrent.futures
+import copy
 import io
 import json
+import logging
 
 import ntelebot
 
 
-class Bot:  # pylint: disable=too-few-public-methods
-    """A simple implementation of https://core.telegram.org/bots/api."""
+class Bot:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """A simple implementation of https://core.telegram.org/bots/api.
+
+    If cache is True (or a {method name: seconds} dict to use instead of CACHE_TTLS), results of
+    the listed read-only methods are reused for that long, concurrent identical calls share a single
+    request, and Bot.invalidate (called by the preprocessor as chat_member, my_chat_member, and
+    join/leave updates arrive) drops results that are known to have changed. (Loop requests
+    chat_member updates only for bots with a cache.)
+
+    If deeplinks (an ntelebot.callbackstore.CallbackStore) is given, commands too long to fit in a
+    deeplink even compressed are kept there (see ntelebot.deeplink.encode).
+
+    If base_url is given, it replaces BASE_URL (e.g. to talk to an ntelebot.fakeserver.FakeServer).
+    """
 
     BASE_URL = 'https://api.telegram.org/bot'
 
-    def __init__(self, token, timeout=12):
+    # How long (and for at most how many users) to remember that a user has not opened a private
+    # chat with the bot.
+    UNREACHABLE_TTL = 60 * 60
+    UNREACHABLE_MAXSIZE = 100000
+
+    CACHE_TTLS = {
+        'getchat': 5 * 60,
+        'getchatadministrators': 5 * 60,
+        'getchatmember': 60,
+        'getme': 60 * 60,
+    }
+    CACHE_MAXSIZE = 10000
+
+    def __init__(self,
+                 token,
+                 timeout=12,
+                 username=None,
+                 cache=None,
+                 *,
+                 deeplinks=None,
+                 base_url=None):
+        # pylint: disable=too-many-arguments
         assert token.count(':') == 1 and token.split(':')[0].isdigit() and '/' not in token, token
         self.token = token
-        self.url = f'{self.BASE_URL}{token}/'
+        if username is not None:
+            self._username = username
+        self.url = f'{base_url or self.BASE_URL}{token}/'
         self.timeout = timeout
+        self.deeplinks = deeplinks
+        self.unreachable = ntelebot.cache.TTLCache(self.UNREACHABLE_TTL, self.UNREACHABLE_MAXSIZE)
+        self.cache_ttls = {}
+        self.cache = None
+        if cache:
+            if cache is True:
+                cache = self.CACHE_TTLS
+            self.cache_ttls = {k.lower().replace('_', ''): ttl for k, ttl in cache.items()}
+            self.cache = ntelebot.cache.ReadThroughCache(60, self.CACHE_MAXSIZE)
 
     def __getattr__(self, k):
         api_key = k.lower().replace('_', '')
         if api_key == k:
             request = _Request(self.url + api_key, self.timeout)
+            if api_key in self.cache_ttls:
+                request = _CachedRequest(request, self.cache, api_key, self.cache_ttls[api_key])
         else:
             request = getattr(self, api_key)
         setattr(self, k, request)
@@ -29,20 +78,74 @@ class Bot:  # pylint: disable=too-few-public-methods
     _username = None
 
     @property
-    def username(self):  # pylint: disable=missing-docstring
+    def username(self):
+        """The bot's username, as given to Bot() or else looked up (once) via get_me."""
+
         if self._username is None:
             self._username = self.get_me()['username']
         return self._username
 
+    _batched = None
+
+    @property
+    def batched(self):
+        """An ntelebot.batcher.Batcher merging this bot's deletes, forwards, and copies.
+
+        For example, bot.batched.delete_message(chat_id=..., message_id=...).result().
+        """
+
+        if self._batched is None:
+            self._batched = ntelebot.batcher.Batcher(self)
+        return self._batched
+
+    def broadcast(self, chat_ids, path=None, forbidden_path=None, **message):
+        """Send message to every chat in chat_ids, resumably (see ntelebot.broadcast.Broadcast).
+
+        Returns {chat_id: 'sent', 'forbidden', or the name of the error}.
+        """
+
+        broadcast = ntelebot.broadcast.Broadcast(self, path=path, forbidden_path=forbidden_path)
+        return broadcast.run(chat_ids, **message)
+
+    def invalidate(self, chat_id, user_id=None):
+        """Drop cached results about chat_id (or only those that could involve user_id)."""
+
+        if self.cache:
+            self.cache.evict(lambda key: key[1] == chat_id and (user_id is None or key[2] in
+                                                                (user_id, None)))
+
     def encode_link(self, command, text=None):
         """Generate an HTML fragment that links to a deeplink back to the bot."""
 
-        return ntelebot.deeplink.encode_link(self.username, command, text=text)
+        return ntelebot.deeplink.encode_link(self.username,
+                                             command,
+                                             text=text,
+                                             store=self.deeplinks)
 
     def encode_url(self, command):
         """Generate a deeplink URL."""
 
-        return ntelebot.deeplink.encode_url(self.username, command)
+        return ntelebot.deeplink.encode_url(self.username, command, store=self.deeplinks)
+
+
+def resolve_usernames(bots, max_workers=32):
+    """Look up (via get_me, concurrently) the username of every bot that doesn't know it yet.
+
+    Returns {token: username} for every bot, suitable for persisting and passing back to Bot() on
+    the next startup. Bots whose lookup fails are logged and left out (to retry lazily on first
+    use).
+    """
+
+    def _resolve(bot):
+        try:
+            return bot.token, bot.username
+        except (ntelebot.errors.Error, ntelebot.requests.RequestException) as e:
+            logging.warning('Unable to look up the username for bot %s: %r',
+                            bot.token.split(':', 1)[0], e)
+            return bot.token, None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return {token: username for token, username in executor.map(_resolve, bots) if username}
 
 
 class _Request:  # pylint: disable=too-few-public-methods
@@ -84,21 +187,51 @@ class _Request:  # pylint: disable=too-few-public-methods
         raise ntelebot.errors.Error(data)
 
 
+class _CachedRequest:  # pylint: disable=too-few-public-methods
+
+    def __init__(self, request, cache, api_key, ttl):
+        self.request = request
+        self.url = request.url
+        self.cache = cache
+        self.api_key = api_key
+        self.ttl = ttl
+
+    def __call__(self, **params):
+        key = (self.api_key, params.get('chat_id'), params.get('user_id'),
+               json.dumps(params, sort_keys=True))
+        result = self.cache.get(key, lambda: self.request(**params), self.ttl)
+        # Callers are free to modify what they get back, so don't hand out the cached copy itself.
+        return copy.deepcopy(result)
+
+
 def _prepare(params):
     files = {}
     data = _separate_files(files, params)
 
     if not files:
-        return {'json': data}
+        if not any(isinstance(v, ntelebot.keyboardutil.FrozenKeyboard) for v in data.values()):
+            return {'json': data}
+        # Splice in pre-serialized keyboards rather than encoding them all over again.
+        fields = ', '.join(f'{json.dumps(key)}: {_dumps(value)}' for key, value in data.items())
+        headers = {'Content-Type': 'application/json'}
+        return {'data': f'{{{fields}}}'.encode('ascii'), 'headers': headers}
 
     # See https://github.com/nmlorg/ntelebot/issues/7#issuecomment-933581503.
     for key, value in data.items():
         if not isinstance(value, str):
-            data[key] = json.dumps(value)
+            data[key] = _dumps(value)
     return {'data': data, 'files': files}
 
 
+def _dumps(value):
+    if isinstance(value, ntelebot.keyboardutil.FrozenKeyboard):
+        return value.json
+    return json.dumps(value)
+
+
 def _separate_files(files, params):
+    if isinstance(params, ntelebot.keyboardutil.FrozenKeyboard):
+        return params
     if isinstance(params, dict):
         return {k: _separate_files(files, v) for k, v in params.items()}
     if isinstance(params, (list, tuple)):
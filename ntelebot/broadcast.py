@@ -0,0 +1,164 @@
+"""Send one message to many chats, as fast as Telegram allows, resumably."""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import ntelebot
+
+
+class Broadcast:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """Send one message to many chats, as fast as Telegram allows, resumably.
+
+    Sends run on workers threads, paced together to at most rate per second (by default
+    ntelebot.limits.messages_per_second_max), and all pause for as long as Telegram asks whenever
+    one gets TooManyRequests. Transient failures (timeouts, transport errors, and 502s) are retried
+    up to retries times.
+
+    Each chat's outcome ('sent', 'forbidden', or the name of the error) is kept in Broadcast.results
+    and, if path is given, appended there as it happens, so a Broadcast re-created with the same
+    path skips every chat already sent to (or Forbidden), and tries the rest again. Chats that
+    return Forbidden (the user blocked the bot, or it was removed from the group) are also added to
+    Broadcast.forbidden and, if forbidden_path is given, saved there, so later broadcasts using the
+    same file skip them entirely.
+    """
+
+    def __init__(self, bot, path=None, forbidden_path=None, *, rate=None, workers=8, retries=3):
+        # pylint: disable=too-many-arguments
+        self.bot = bot
+        self.path = path
+        self.forbidden_path = forbidden_path
+        self.workers = workers
+        self.retries = retries
+        self.results = _load(path)
+        self.forbidden = set(_load(forbidden_path))
+        self._limiter = _RateLimiter(rate or ntelebot.limits.messages_per_second_max)
+        self._lock = threading.Lock()
+        self._log = self._forbidden_log = None
+
+    def run(self, chat_ids, method='send_message', **message):
+        """Send message (Bot.<method>(chat_id=..., **message)) to every chat in chat_ids.
+
+        Returns Broadcast.results.
+        """
+
+        send = getattr(self.bot, method)
+        todo = queue.Queue(self.workers * 4)
+        threads = [
+            threading.Thread(target=self._work, args=(todo, send, message), daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._log = _open(self.path)
+            self._forbidden_log = _open(self.forbidden_path)
+            for chat_id in chat_ids:
+                if (self.results.get(chat_id) not in ('sent', 'forbidden') and
+                        chat_id not in self.forbidden):
+                    todo.put(chat_id)
+        finally:
+            for _ in threads:
+                todo.put(None)
+            for thread in threads:
+                thread.join()
+            for fobj in (self._log, self._forbidden_log):
+                if fobj:
+                    fobj.close()
+            self._log = self._forbidden_log = None
+        return self.results
+
+    def _work(self, todo, send, message):
+        while (chat_id := todo.get()) is not None:
+            self._record(chat_id, self._send(send, chat_id, message))
+
+    def _send(self, send, chat_id, message):
+        attempt = 0
+        while True:
+            self._limiter.wait()
+            try:
+                send(chat_id=chat_id, **message)
+                return 'sent'
+            except ntelebot.errors.TooManyRequests as e:
+                logging.info('Rate limited while broadcasting: %r', e)
+                self._limiter.pause(e.retry_after or 1)
+            except ntelebot.errors.Forbidden:
+                return 'forbidden'
+            except (ntelebot.errors.BadGateway, ntelebot.errors.Timeout,
+                    ntelebot.requests.ConnectionError) as e:
+                attempt += 1
+                if attempt > self.retries:
+                    return type(e).__name__
+                time.sleep(attempt)
+            except (ntelebot.errors.Error, ntelebot.requests.RequestException) as e:
+                return type(e).__name__
+            except Exception as e:  # pylint: disable=broad-except
+                logging.exception('Unexpected error while broadcasting to %r:', chat_id)
+                return type(e).__name__
+
+    def _record(self, chat_id, status):
+        line = json.dumps([chat_id, status]) + '\n'
+        with self._lock:
+            self.results[chat_id] = status
+            if self._log:
+                self._log.write(line)
+                self._log.flush()
+            if status == 'forbidden':
+                self.forbidden.add(chat_id)
+                if self._forbidden_log:
+                    self._forbidden_log.write(line)
+                    self._forbidden_log.flush()
+
+
+def _load(path):
+    """Read [chat_id, status] lines from path, ignoring a partial line left by a crash."""
+
+    results = {}
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as fobj:
+            for line in fobj:
+                try:
+                    chat_id, status = json.loads(line)
+                except ValueError:
+                    continue
+                results[chat_id] = status
+    return results
+
+
+def _open(path):
+    if not path:
+        return None
+    fobj = open(path, 'a+', encoding='utf-8')  # pylint: disable=consider-using-with
+    if fobj.tell():
+        fobj.seek(fobj.tell() - 1)
+        if fobj.read(1) != '\n':
+            # Don't append to a partial line left by a crash.
+            fobj.write('\n')
+    return fobj
+
+
+class _RateLimiter:
+    """Hands out evenly spaced send slots to any number of threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Hand out no more slots for the next seconds seconds."""
+
+        with self._lock:
+            self.next = max(self.next, time.monotonic() + seconds)
+
+    def wait(self):
+        """Sleep until this thread's slot comes up."""
+
+        with self._lock:
+            slot = self.next = max(self.next, time.monotonic()) + self.interval
+        delay = slot - self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,152 @@
+"""Small in-process caches with per-entry expiration."""
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+
+class TTLCache:
+    """A dict-like mapping whose entries disappear ttl seconds after being set.
+
+    If maxsize is set, the least recently used entries are evicted once the cache grows past it.
+
+    Entries are kept in least-to-most recently used order, and expired entries are purged from the
+    front (until the first unexpired one) whenever the cache is read from or written to, so each
+    entry is dropped eventually without the whole cache ever being scanned.
+    """
+
+    def __init__(self, ttl, maxsize=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __len__(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._data)
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def _expire(self, now):
+        for key in [key for key, (expires, _) in self._data.items() if expires <= now]:
+            del self._data[key]
+
+    def _purge(self, now):
+        data = self._data
+        while data and next(iter(data.values()))[0] <= now:
+            data.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+
+        with self._lock:
+            self._data.clear()
+
+    def evict(self, predicate):
+        """Remove every entry whose key satisfies predicate."""
+
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def get(self, key, default=None):
+        """Return the unexpired value stored for key, or default."""
+
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            record = self._data.get(key)
+            if record is None:
+                return default
+            expires, value = record
+            if expires <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def pop(self, key, default=None):
+        """Remove key, returning its unexpired value (or default)."""
+
+        with self._lock:
+            record = self._data.pop(key, None)
+        if record is None or record[0] <= time.monotonic():
+            return default
+        return record[1]
+
+    def set(self, key, value, ttl=None):
+        """Store value for key for ttl (or self.ttl) seconds."""
+
+        if ttl is None:
+            ttl = self.ttl
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            self._data[key] = (now + ttl, value)
+            self._data.move_to_end(key)
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class ReadThroughCache:
+    """A TTLCache that fills itself, sharing a single call among concurrent misses for a key."""
+
+    def __init__(self, ttl, maxsize=None):
+        self.entries = TTLCache(ttl, maxsize)
+        self._inflight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def evict(self, predicate):
+        """Remove every entry whose key satisfies predicate (including any being fetched now)."""
+
+        with self._lock:
+            self._generation += 1
+        self.entries.evict(predicate)
+
+    def get(self, key, func, ttl=None):
+        """Return the cached value for key, or call func() to fetch (and cache) it.
+
+        If other threads ask for the same key while func() is running, they wait for and share its
+        result (or exception) rather than calling func() again.
+        """
+
+        value = self.entries.get(key, self)
+        if value is not self:
+            return value
+
+        with self._lock:
+            if (future := self._inflight.get(key)) is None:
+                future = self._inflight[key] = concurrent.futures.Future()
+                generation = self._generation
+            else:
+                generation = None
+        if generation is None:
+            return future.result()
+
+        try:
+            value = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                # Don't cache a value fetched before an evict() that may have been meant for it.
+                current = generation == self._generation
+        if current:
+            self.entries.set(key, value, ttl)
+        future.set_result(value)
+        return value
@@ -0,0 +1,115 @@
+"""Keep long callback_data and Context.meta server-side, sending only short ids to Telegram."""
+
+import base64
+import collections
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+
+# '\1id\1callback_data' (for callback_data that still fits) or '\2id\2index' (for callback_data
+# kept in the entry's 'data' list).
+_CODE = re.compile('^([\x01\x02])([-_0-9A-Za-z]+)\\1(.*)$', re.DOTALL)
+
+
+class CallbackStore:
+    """Keeps the over-long callback_data and meta of sent keyboards, keyed by short ids.
+
+    Entries are kept in memory (up to maxsize, least recently used first out) and, if path is given,
+    in an SQLite table there, so buttons keep working across restarts. Ids are derived from entries'
+    contents, so resending the same keyboard and meta reuses the same entry.
+    """
+
+    def __init__(self, path=None, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.conn = None
+        self._lock = threading.Lock()
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries (id TEXT PRIMARY KEY, value TEXT)')
+
+    def put(self, value):
+        """Store value (anything JSON-encodable), returning its id."""
+
+        text = json.dumps(value, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        key = base64.urlsafe_b64encode(
+            hashlib.blake2b(text.encode('utf8'), digest_size=6).digest()).decode('ascii')
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return key
+            self._remember(key, value)
+            if self.conn:
+                with self.conn:
+                    self.conn.execute('INSERT OR IGNORE INTO entries (id, value) VALUES (?, ?)',
+                                      (key, text))
+        return key
+
+    def get(self, key):
+        """Return the value stored under key (or None)."""
+
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            if self.conn:
+                row = self.conn.execute('SELECT value FROM entries WHERE id = ?', (key,)).fetchone()
+                if row:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    return value
+        return None
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def fix(self, keyboard, meta=None, maxlen=64):
+        """Point keyboard's buttons at an entry holding meta and any over-long callback_data.
+
+        If there is meta, every button is encoded (so any of them can recover it); otherwise only
+        buttons whose callback_data is over maxlen are. keyboard is modified in place. Returns the
+        entry's id, or None if there was nothing to store.
+        """
+
+        buttons = [button for row in keyboard for button in row if 'callback_data' in button]
+        if not meta:
+            buttons = [button for button in buttons if len(button['callback_data']) > maxlen]
+        if not buttons:
+            return None
+        # Ids are always 8 characters, so each code is 10.
+        lines = list(
+            dict.fromkeys(button['callback_data']
+                          for button in buttons
+                          if len(button['callback_data']) > maxlen - 10))
+        key = self.put({'data': lines, 'meta': meta or None})
+        indexes = {line: i for i, line in enumerate(lines)}
+        for button in buttons:
+            i = indexes.get(button['callback_data'])
+            if i is None:
+                button['callback_data'] = f'\1{key}\1{button["callback_data"]}'
+            else:
+                button['callback_data'] = f'\2{key}\2{i}'
+        return key
+
+    def combine(self, text):
+        """Convert callback_data encoded by CallbackStore.fix back into (callback_data, meta).
+
+        Text that wasn't encoded, or whose entry has been lost, is returned as is with no meta
+        (except that callback_data short enough to have been kept inline is still recovered).
+        """
+
+        ret = _CODE.match(text)
+        if not ret:
+            return text, None
+        kind, key, rest = ret.groups()
+        entry = self.get(key)
+        if kind == '\1':
+            return rest, entry and entry['meta']
+        if entry is None or not rest.isdigit() or int(rest) >= len(entry['data']):
+            return text, None
+        return entry['data'][int(rest)], entry['meta']
@@ -0,0 +1,102 @@
+"""Durable storage for the highest update_id each bot has finished dispatching."""
+
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import ntelebot
+
+
+class _Checkpoint(abc.ABC):
+    """Batches acks in memory, writing them out at most once every interval seconds.
+
+    Offsets are stored by bot id (the part of the token before the colon), so the saved file or
+    table never contains a bot's credentials.
+    """
+
+    def __init__(self, interval=1, scheduler=None):
+        self.interval = interval
+        self.scheduler = scheduler or ntelebot.scheduler.shared()
+        self.offsets = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._last_flush = 0
+
+    def ack(self, token, update_id):
+        """Record that every update up to and including update_id has been dispatched."""
+
+        bot_id = _bot_id(token)
+        with self._lock:
+            if update_id <= self.offsets.get(bot_id, -1):
+                return
+            self.offsets[bot_id] = update_id
+            if self._dirty:
+                return
+            self._dirty = True
+            delay = self._last_flush + self.interval - time.monotonic()
+        if delay <= 0:
+            self.flush()
+        else:
+            self.scheduler.call_later(delay, self.flush)
+
+    def flush(self):
+        """Write out any pending acks."""
+
+        with self._lock:
+            if self._dirty:
+                self._write(dict(self.offsets))
+                self._dirty = False
+                self._last_flush = time.monotonic()
+
+    def get(self, token):
+        """Return the highest update_id acked for token (or None)."""
+
+        with self._lock:
+            return self.offsets.get(_bot_id(token))
+
+    @abc.abstractmethod
+    def _write(self, offsets):
+        """Durably store offsets ({bot id: update_id})."""
+
+
+class FileCheckpoint(_Checkpoint):
+    """Keeps {bot id: update_id} in a JSON file, atomically replaced (and fsynced) on each flush."""
+
+    def __init__(self, path, interval=1, scheduler=None):
+        super().__init__(interval=interval, scheduler=scheduler)
+        self.path = path
+        if os.path.exists(path):
+            with open(path, encoding='ascii') as fobj:
+                self.offsets.update(json.load(fobj))
+
+    def _write(self, offsets):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='ascii') as fobj:
+            json.dump(offsets, fobj)
+            fobj.flush()
+            os.fsync(fobj.fileno())
+        os.replace(tmp, self.path)
+
+
+class SqliteCheckpoint(_Checkpoint):
+    """Keeps bot id -> update_id in an SQLite table, committed on each flush."""
+
+    def __init__(self, path, interval=1, scheduler=None):
+        super().__init__(interval=interval, scheduler=scheduler)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA synchronous = FULL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS offsets (bot_id TEXT PRIMARY KEY, update_id INTEGER)')
+        self.offsets.update(self.conn.execute('SELECT bot_id, update_id FROM offsets'))
+
+    def _write(self, offsets):
+        with self.conn:
+            self.conn.executemany('REPLACE INTO offsets (bot_id, update_id) VALUES (?, ?)',
+                                  offsets.items())
+
+
+def _bot_id(token):
+    return token.split(':', 1)[0]
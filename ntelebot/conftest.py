@@ -5,6 +5,7 @@ import os
 import pytest
 
 import ntelebot
+import ntelebot.fakeserver
 
 
 @pytest.fixture(autouse=True)
@@ -20,6 +21,63 @@ def _bot_mock(monkeypatch, requests_mock):
     monkeypatch.setattr('ntelebot.bot._Request', MockRequest)
 
 
+@pytest.fixture
+def fake_server(requests_mock):
+    """A running ntelebot.fakeserver.FakeServer (with requests_mock letting requests through)."""
+
+    requests_mock.real_http = True
+    with ntelebot.fakeserver.FakeServer() as server:
+        yield server
+
+
+class MockScheduler:
+    """Records calls to call_at and call_later, running them only when run() is called."""
+
+    def __init__(self):
+        self.calls = []
+
+    def call_at(self, when, func, *args):
+        """Record func(*args) to be run at when."""
+
+        self.calls.append((when, func, args))
+
+    def call_later(self, delay, func, *args):
+        """Record func(*args) to be run after delay seconds."""
+
+        self.calls.append((delay, func, args))
+
+    def run(self):
+        """Run (and forget) everything recorded so far, in scheduled order."""
+
+        calls, self.calls = self.calls, []
+        for _, func, args in sorted(calls, key=lambda call: call[0]):
+            func(*args)
+
+
+@pytest.fixture
+def scheduler():
+    """A MockScheduler, to be passed as the scheduler to anything built on ntelebot.scheduler."""
+
+    return MockScheduler()
+
+
+class MockExecutor:  # pylint: disable=too-few-public-methods
+    """Runs everything submitted to it immediately, on the calling thread."""
+
+    @staticmethod
+    def submit(func, *args):
+        """Run func(*args) now."""
+
+        func(*args)
+
+
+@pytest.fixture
+def executor():
+    """A MockExecutor, to be passed as the executor alongside a MockScheduler."""
+
+    return MockExecutor()
+
+
 @pytest.fixture
 def bot_test_chat():
     """The chat_id of a person or group the bot can send messages to."""
@@ -1,45 +1,104 @@
 """Utilities related to https://core.telegram.org/bots#deep-linking."""
 
 import base64
+import functools
 import html
+import logging
+import zlib
 
+# Telegram ignores start= values longer than this.
+MAX_LENGTH = 64
 
-def decode(text):
-    """Extract the original command from a deeplink's start= value."""
+# Commands too long to fit as is are deflated and marked with a leading '_', or kept in a store and
+# replaced by '-' and their id there. Plain base64 can only start with '_' or '-' for a first byte
+# of 0xf8 or above, which never begins valid UTF-8, so neither is ambiguous.
+_COMPRESSED = '_'
+_STORED = '-'
+_INFLATE_MAX = 4096
 
-    if not isinstance(text, bytes):
+
+def decode(text, store=None):
+    """Extract the original command from a deeplink's start= value.
+
+    Values made by encode(..., store) can only be decoded with the same store (or one sharing its
+    SQLite file).
+    """
+
+    if isinstance(text, bytes):
         try:
-            text = text.encode('ascii')
-        except UnicodeEncodeError:
+            text = text.decode('ascii')
+        except UnicodeDecodeError:
             return ''
 
+    if text.startswith(_STORED):
+        command = store and store.get(text[len(_STORED):])
+        return command if isinstance(command, str) else ''
+
+    return _decode(text)
+
+
+@functools.lru_cache(maxsize=4096)
+def _decode(text):
     try:
-        text = base64.urlsafe_b64decode(text + b'====')
+        data = base64.urlsafe_b64decode(text.removeprefix(_COMPRESSED).encode('ascii') + b'====')
     except (TypeError, ValueError):
+        # (UnicodeEncodeError is a ValueError.)
         return ''
 
+    if text.startswith(_COMPRESSED):
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(data, _INFLATE_MAX)
+        except zlib.error:
+            return ''
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            return ''
+
     try:
-        return text.decode('utf-8')
+        return data.decode('utf-8')
     except UnicodeDecodeError:
         return ''
 
 
-def encode(text):
-    """Prepare text for use as a Telegram bot deeplink's start= value."""
+def encode(text, store=None):
+    """Prepare text for use as a Telegram bot deeplink's start= value.
+
+    Text whose base64 is over MAX_LENGTH is compressed, and if that still doesn't fit and store (an
+    ntelebot.callbackstore.CallbackStore) is given, kept there, with only its id in the link.
+    """
 
     if not isinstance(text, bytes):
         text = text.encode('utf-8')
 
-    return base64.urlsafe_b64encode(text).rstrip(b'=').decode('ascii')
+    value = _encode(text)
+    if len(value) <= MAX_LENGTH:
+        return value
+    if store is not None:
+        return f'{_STORED}{store.put(text.decode("utf-8", "replace"))}'
+    logging.warning('Deeplink for %r is %s characters long; Telegram will ignore it.', text,
+                    len(value))
+    return value
+
+
+@functools.lru_cache(maxsize=4096)
+def _encode(text):
+    value = base64.urlsafe_b64encode(text).rstrip(b'=').decode('ascii')
+    if len(value) <= MAX_LENGTH:
+        return value
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(text) + compressor.flush()
+    compressed = _COMPRESSED + base64.urlsafe_b64encode(compressed).rstrip(b'=').decode('ascii')
+    return min(value, compressed, key=len)
 
 
-def encode_link(username, command, text=None):
+def encode_link(username, command, text=None, store=None):
     """Generate an HTML fragment that links to a deeplink back to the bot."""
 
-    return f'<a href="{html.escape(encode_url(username, command))}">{text or command}</a>'
+    url = encode_url(username, command, store=store)
+    return f'<a href="{html.escape(url)}">{text or command}</a>'
 
 
-def encode_url(username, command):
+def encode_url(username, command, store=None):
     """Generate a deeplink URL."""
 
-    return f'https://t.me/{username}?start={encode(command)}'
+    return f'https://t.me/{username}?start={encode(command, store=store)}'
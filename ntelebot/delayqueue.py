@@ -1,16 +1,36 @@
 """A queue of (when, item) that doesn't return items until their target time has passed."""
 
+import asyncio
 import heapq
+import json
+import mmap
+import os
 import queue
+import threading
 import time
 
 
 class DelayQueue(queue.PriorityQueue):
-    """A queue of (when, item) that doesn't return items until their target time has passed."""
+    """A queue of (when, item) that doesn't return items until their target time has passed.
+
+    Items are put onto the incoming queue (self.queue), then moved by get() into heap (or, for
+    putafter, monotonic_heap), which keeps them in order until they come due.
+    """
+
+    # Cancelled records are left in place (and skipped when they reach the front), until there are
+    # at least this many and they outnumber live records, at which point they are swept out at once.
+    COMPACT_MIN = 1024
+
+    # Waits for items scheduled against the wall clock (putwhen, puthourly) are capped at this many
+    # seconds, so a jump in the system clock is noticed reasonably quickly. Waits for items
+    # scheduled with putafter use the monotonic clock and are exact.
+    WALL_CLOCK_RECHECK = 60
 
     def _init(self, maxsize):
         super()._init(maxsize)
-        self.__subqueue = []
+        self.heap = _Heap()
+        self.monotonic_heap = _Heap()
+        self.__dead = 0
 
     def puthourly(self, offset, item, jitter=0):
         """Schedule item to be returned at the next offset past the hour.
@@ -29,28 +49,426 @@ class DelayQueue(queue.PriorityQueue):
             when += 3600
         return self.putwhen(when + jitter, item)
 
+    def putafter(self, delay, item):
+        """Schedule item to be returned after delay seconds, regardless of changes to the clock.
+
+        Returns a Timer that can be used to cancel or reschedule the item.
+        """
+
+        return Timer(self, self._push(time.monotonic() + delay, item, _MonotonicRecord))
+
     def putwhen(self, when, item):
-        """Schedule item to be returned when time.time() >= when."""
+        """Schedule item to be returned when time.time() >= when.
 
-        return super().put((when, time.time(), item))
+        Returns a Timer that can be used to cancel or reschedule the item.
+        """
+
+        return Timer(self, self._push(when, item, _Record))
 
     def put(self, item):  # pylint: disable=arguments-differ
         return self.putwhen(0, item)
 
     def get(self):  # pylint: disable=arguments-differ
-        while True:
-            delay = 10000
-            if self.__subqueue:
-                when, _, item = self.__subqueue[0]
-                now = time.time()
-                if when <= now:
-                    heapq.heappop(self.__subqueue)
-                    return item
-                delay = when - now
-
-            try:
-                record = super().get(True, delay)
-            except queue.Empty:
-                pass
-            else:
-                heapq.heappush(self.__subqueue, record)
+        return self.get_due(1)[0]
+
+    def get_due(self, max_items=None):
+        """Wait until at least one item is due, then return all (up to max_items) that are.
+
+        Everything is collected under a single acquisition of the queue's lock. (If join() is being
+        used, task_done() still needs to be called once for each item returned.)
+        """
+
+        records = []
+        with self.not_empty:
+            while True:
+                if self.queue:
+                    incoming, self.queue = self.queue, []
+                    for record in incoming:
+                        if isinstance(record, _MonotonicRecord):
+                            self.monotonic_heap.push(record)
+                        else:
+                            self.heap.push(record)
+                    self.not_full.notify_all()
+
+                clocks = ((self.heap, time.time()), (self.monotonic_heap, time.monotonic()))
+                for heap, now in clocks:
+                    while max_items is None or len(records) < max_items:
+                        record = heap.pop(now)
+                        if record is None:
+                            break
+                        if record.dead:
+                            self.__dead = max(self.__dead - 1, 0)
+                            continue
+                        record.dead = True
+                        records.append(record)
+                if records:
+                    self._retired(records)
+                    return [record[2] for record in records]
+
+                self.not_empty.wait(self.__delay())
+
+    def __delay(self):
+        delay = None
+        if (when := self.heap.next_when()) is not None:
+            delay = min(when - time.time(), self.WALL_CLOCK_RECHECK)
+        if (when := self.monotonic_heap.next_when()) is not None:
+            when -= time.monotonic()
+            if delay is None or when < delay:
+                delay = when
+        return delay
+
+    def _push(self, when, item, record_type):
+        record = record_type((when, time.time(), item))
+        self._added(record)
+        super().put(record)
+        return record
+
+    def _added(self, record):
+        """Called with each new record, just before it is put onto the incoming queue."""
+
+    def _retired(self, records):
+        """Called (with self.mutex held) with records that have just been returned or cancelled."""
+
+    def _cancel(self, record):
+        with self.mutex:
+            if record.dead:
+                return False
+            record.dead = True
+            self._retired((record,))
+            self.__dead += 1
+            total = len(self.queue) + len(self.heap) + len(self.monotonic_heap)
+            if self.__dead >= self.COMPACT_MIN and self.__dead * 2 > total:
+                self._compact()
+        self.task_done()
+        return True
+
+    def _compact(self):
+        """Sweep cancelled records out of the incoming queue and heaps (with self.mutex held)."""
+
+        self.queue = [record for record in self.queue if not record.dead]
+        heapq.heapify(self.queue)
+        self.heap.compact()
+        self.monotonic_heap.compact()
+        self.__dead = 0
+
+
+class PersistentDelayQueue(DelayQueue):  # pylint: disable=too-many-instance-attributes
+    """A DelayQueue whose pending items survive restarts.
+
+    Every item scheduled is appended to the log at path as a line of JSON ([id, when, item]), as is
+    every item returned or cancelled ([id]). Creating a PersistentDelayQueue with an existing log
+    scans it (through mmap) and reschedules everything still pending, without any help from the
+    application. Once retired lines outnumber live ones (and there are at least COMPACT_MIN), the
+    log is rewritten with only the live ones.
+
+    Items must be JSON-serializable. Items scheduled with putafter are stored (and restored) with
+    their equivalent wall-clock time. If fsync is true, the log is fsynced after every write rather
+    than just flushed.
+
+    Call close() (or use it as a context manager) once done with it, to close the log.
+    """
+
+    def __init__(self, path, maxsize=0, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self.__lock = threading.Lock()
+        self.__live = {}
+        self.__ids = {}
+        self.__next_id = 0
+        self.__garbage = 0
+        self.__log = None
+        super().__init__(maxsize)
+        self.__load()
+        if self.__garbage:
+            self.__rewrite()
+        else:
+            self.__log = open(self.path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the log. Nothing more may be scheduled, returned, or cancelled afterward."""
+
+        with self.__lock:
+            if self.__log:
+                self.__log.close()
+                self.__log = None
+
+    def __load(self):
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return
+        lines = 0
+        with open(self.path, 'rb') as fobj:
+            with mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                # Lines are read (and parsed) one at a time straight off the map, so only the live
+                # entries, never the whole log, are ever held in memory.
+                for line in iter(buf.readline, b''):
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Most likely a partial line left by a crash mid-write.
+                        continue
+                    if len(entry) == 3:
+                        self.__live[entry[0]] = entry[1:]
+                    else:
+                        self.__live.pop(entry[0], None)
+        # Anything unparsable must be rewritten away before any new lines are appended after it.
+        self.__garbage = lines - len(self.__live)
+        if self.__live:
+            self.__next_id = max(self.__live) + 1
+
+        records = []
+        for log_id, (when, item) in self.__live.items():
+            # The log id stands in for the original time.time() as the tiebreaker between items due
+            # at the same time: it is unique, preserves their original order, and sorts ahead of
+            # anything scheduled from now on.
+            record = _Record((when, log_id, item))
+            self.__ids[id(record)] = log_id
+            records.append(record)
+        with self.mutex:
+            self.queue.extend(records)
+            heapq.heapify(self.queue)
+            self.unfinished_tasks += len(records)
+
+    def _added(self, record):
+        when, _, item = record
+        if isinstance(record, _MonotonicRecord):
+            when += time.time() - time.monotonic()
+        with self.__lock:
+            log_id = self.__next_id
+            self.__next_id += 1
+            self.__ids[id(record)] = log_id
+            self.__live[log_id] = [when, item]
+            self.__write([log_id, when, item])
+
+    def _retired(self, records):
+        with self.__lock:
+            for record in records:
+                log_id = self.__ids.pop(id(record), None)
+                if log_id is not None:
+                    del self.__live[log_id]
+                    self.__write([log_id])
+                    self.__garbage += 2
+            if self.__garbage >= self.COMPACT_MIN and self.__garbage > len(self.__live):
+                self.__rewrite()
+
+    def __rewrite(self):
+        if self.__log:
+            self.__log.close()
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fobj:
+            for log_id, (when, item) in self.__live.items():
+                fobj.write(_dumps([log_id, when, item]))
+            fobj.flush()
+            os.fsync(fobj.fileno())
+        os.replace(tmp, self.path)
+        self.__log = open(self.path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+        self.__garbage = 0
+
+    def __write(self, entry):
+        self.__log.write(_dumps(entry))
+        self.__log.flush()
+        if self.fsync:
+            os.fsync(self.__log.fileno())
+
+
+def _dumps(entry):
+    return f'{json.dumps(entry, ensure_ascii=False, separators=(",", ":"))}\n'
+
+
+class AsyncDelayQueue:
+    """An asyncio counterpart to DelayQueue, built on event loop timers rather than threads.
+
+    Each pending item is just a TimerHandle in the event loop's own schedule, so one loop can hold
+    hundreds of thousands of them. Like the rest of asyncio this is not thread-safe; it must be used
+    from the thread running the event loop.
+    """
+
+    def __init__(self):
+        self._ready = asyncio.Queue()
+
+    def puthourly(self, offset, item, jitter=0):
+        """Schedule item to be returned at the next offset past the hour (see DelayQueue)."""
+
+        now = time.time()
+        when = now // 3600 * 3600 + offset
+        if when <= now:
+            when += 3600
+        return self.putwhen(when + jitter, item)
+
+    def putafter(self, delay, item):
+        """Schedule item to be returned after delay seconds (measured by the event loop's clock)."""
+
+        timer = AsyncTimer(self._ready, item)
+        timer._schedule(delay)  # pylint: disable=protected-access
+        return timer
+
+    def putwhen(self, when, item):
+        """Schedule item to be returned when time.time() >= when."""
+
+        return self.putafter(when - time.time(), item)
+
+    def put(self, item):
+        """Make item available to get() immediately."""
+
+        self._ready.put_nowait(item)
+
+    async def get(self):
+        """Wait for the next item to come due, then return it."""
+
+        return await self._ready.get()
+
+    async def get_due(self, max_items=None):
+        """Wait until at least one item is due, then return all (up to max_items) that are."""
+
+        items = [await self._ready.get()]
+        while not self._ready.empty() and (max_items is None or len(items) < max_items):
+            items.append(self._ready.get_nowait())
+        return items
+
+
+class AsyncTimer:
+    """A handle for an item scheduled in an AsyncDelayQueue.
+
+    Times are measured against time.time(), matching AsyncDelayQueue.putwhen.
+    """
+
+    __slots__ = ('_ready', '_item', '_handle', '_pending')
+
+    def __init__(self, ready, item):
+        self._ready = ready
+        self._item = item
+        self._handle = None
+        self._pending = True
+
+    def _fire(self):
+        self._pending = False
+        self._ready.put_nowait(self._item)
+
+    def _schedule(self, delay):
+        loop = asyncio.get_running_loop()
+        self._handle = loop.call_at(loop.time() + delay, self._fire)
+
+    @property
+    def when(self):
+        """The time at which the item is scheduled to be returned."""
+
+        return self._handle.when() - asyncio.get_running_loop().time() + time.time()
+
+    @property
+    def pending(self):
+        """Whether the item has been neither returned nor cancelled yet."""
+
+        return self._pending
+
+    def cancel(self):
+        """Prevent the item from being returned, or return False if it was already returned."""
+
+        if not self._pending:
+            return False
+        self._pending = False
+        self._handle.cancel()
+        return True
+
+    def reschedule(self, when):
+        """Move the item to be returned at when.
+
+        Returns False (leaving the item alone) if it was already returned or cancelled.
+        """
+
+        if not self.cancel():
+            return False
+        self._pending = True
+        self._schedule(when - time.time())
+        return True
+
+
+class _Heap:
+    """Records kept in a binary heap: O(log n) insertion and expiry."""
+
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def compact(self):
+        """Remove all dead records."""
+
+        self.heap = [record for record in self.heap if not record.dead]
+        heapq.heapify(self.heap)
+
+    def next_when(self):
+        """Return the earliest time at which pop might return a record (or None if empty)."""
+
+        if self.heap:
+            return self.heap[0][0]
+
+    def pop(self, now):
+        """Remove and return a record due at or before now, or return None."""
+
+        if self.heap and self.heap[0][0] <= now:
+            return heapq.heappop(self.heap)
+
+    def push(self, record):
+        """Add record."""
+
+        heapq.heappush(self.heap, record)
+
+
+class _Record(tuple):
+    """A (when, time.time(), item) heap entry that can be marked dead without being removed."""
+
+    dead = False
+
+
+class _MonotonicRecord(_Record):
+    """A _Record whose when is measured against time.monotonic() rather than time.time()."""
+
+
+class Timer:
+    """A handle for an item scheduled in a DelayQueue.
+
+    Times are measured against the same clock the item was originally scheduled with: time.time()
+    for putwhen, puthourly, and put, and time.monotonic() for putafter.
+    """
+
+    __slots__ = ('_queue', '_record')
+
+    def __init__(self, delayqueue, record):
+        self._queue = delayqueue
+        self._record = record
+
+    @property
+    def when(self):
+        """The time at which the item is scheduled to be returned."""
+
+        return self._record[0]
+
+    @property
+    def pending(self):
+        """Whether the item has been neither returned nor cancelled yet."""
+
+        return not self._record.dead
+
+    def cancel(self):
+        """Prevent the item from being returned, or return False if it was already returned."""
+
+        return self._queue._cancel(self._record)  # pylint: disable=protected-access
+
+    def reschedule(self, when):
+        """Move the item to be returned at when.
+
+        Returns False (leaving the item alone) if it was already returned or cancelled.
+        """
+
+        if not self.cancel():
+            return False
+        # pylint: disable=protected-access
+        self._record = self._queue._push(when, self._record[2], type(self._record))
+        return True
@@ -10,6 +10,7 @@ class Dispatcher:
 
     def __init__(self):
         self.callbacks = []
+        self._ctx_types = []
 
     def __call__(self, ctx):
         """Dispatch a context to a registered handler."""
@@ -20,15 +21,29 @@ class Dispatcher:
                 return ret
         return False
 
-    def _add(self, callback):
+    @property
+    def ctx_types(self):
+        """The set of Context types some registered callback might handle (None for any)."""
+
+        ret = set()
+        for ctx_types in self._ctx_types:
+            if isinstance(ctx_types, Dispatcher):
+                ctx_types = ctx_types.ctx_types
+            if ctx_types is None:
+                return None
+            ret.update(ctx_types)
+        return ret
+
+    def _add(self, callback, ctx_types=None):
         self.callbacks.append(callback)
+        self._ctx_types.append(ctx_types)
 
     def add(self, callback):
         """Add the given callback to the dispatch list."""
 
         callback = get_callback(callback)
         assert callback
-        self._add(callback)
+        self._add(callback, isinstance(callback, Dispatcher) and callback or None)
 
     def add_command(self, name, callback):
         """Catch messages that start with /name."""
@@ -36,7 +51,7 @@ class Dispatcher:
         callback = get_callback(callback)
         assert callback
         self._add(lambda ctx: (ctx.type in ('message', 'callback_query') and ctx.command == name and
-                               callback(ctx)))  # yapf: disable
+                               callback(ctx)), ('message', 'callback_query'))  # yapf: disable
 
     def add_inline(self, prefix, callback):
         """Catch messages sent via inline callbacks (@username) that start with prefix."""
@@ -44,10 +59,10 @@ class Dispatcher:
         callback = get_callback(callback)
         assert callback
         if not prefix:
-            self._add(lambda ctx: ctx.type == 'inline_query' and callback(ctx))
+            self._add(lambda ctx: ctx.type == 'inline_query' and callback(ctx), ('inline_query',))
         else:
             self._add(lambda ctx: (ctx.type == 'inline_query' and ctx.prefix == prefix and
-                                   callback(ctx)))  # yapf: disable
+                                   callback(ctx)), ('inline_query',))  # yapf: disable
 
     def add_prefix(self, prefix, callback):
         """Catch messages that start with prefix."""
@@ -55,7 +70,8 @@ class Dispatcher:
         callback = get_callback(callback)
         assert callback
         self._add(lambda ctx: (ctx.type in ('message', 'callback_query') and
-                               ctx.prefix == prefix and callback(ctx)))  # yapf: disable
+                               ctx.prefix == prefix and callback(ctx)),
+                  ('message', 'callback_query'))  # yapf: disable
 
 
 class LoopDispatcher(Dispatcher):
@@ -73,6 +89,13 @@ class LoopDispatcher(Dispatcher):
             return super().__call__(ctx)
         return False
 
+    @property
+    def allowed_updates(self):
+        """The update types worth asking Telegram for (None if the preprocessor can't say)."""
+
+        if (allowed_updates := getattr(self.preprocessor, 'allowed_updates', None)):
+            return allowed_updates(self.ctx_types)
+
 
 def getargspec(func):  # pylint: disable=missing-docstring
     argspec = inspect.getfullargspec(func)
@@ -0,0 +1,85 @@
+"""Coalesce bursts of edits to the same message, and drop edits that wouldn't change anything."""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import ntelebot
+
+
+class EditManager:  # pylint: disable=too-few-public-methods
+    """Coalesce bursts of edit_message_text calls, and drop edits that wouldn't change anything.
+
+    The first edit to a message is sent immediately. Further edits made within window seconds of
+    the last one sent are held back, each replacing the one before, and only the latest is sent
+    once the window closes. An edit whose text and options match the last ones sent for that message
+    (compared by hash, remembered for ttl seconds) never leaves the process.
+
+    Held-back edits are timed by scheduler (default the shared ntelebot.scheduler), but sent by
+    executor (default ntelebot.scheduler.shared_executor()), so a slow call doesn't hold up the
+    scheduler's other callbacks.
+    """
+
+    def __init__(self, window=1, scheduler=None, ttl=24 * 60 * 60, maxsize=10000, *, executor=None):
+        # pylint: disable=too-many-arguments
+        self.window = window
+        self.scheduler = scheduler or ntelebot.scheduler.shared()
+        self.executor = executor or ntelebot.scheduler.shared_executor()
+        self.sent = ntelebot.cache.TTLCache(ttl, maxsize)
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def edit(self, bot, chat_id, message_id, **kwargs):
+        """Edit the given message's text, returning the edited Message if it was sent right away.
+
+        If the edit was held back (to be sent, or superseded, later) or dropped, returns None.
+        """
+
+        key = (bot.token, chat_id, message_id)
+        digest = _digest(kwargs)
+        now = time.monotonic()
+        with self._lock:
+            if key in self.pending:
+                # A flush is already scheduled, and will send whichever edit is latest by then.
+                self.pending[key] = (bot, kwargs, digest)
+                return None
+            last = self.sent.get(key)
+            if last and last[0] == digest:
+                return None
+            if last and now - last[1] < self.window:
+                self.pending[key] = (bot, kwargs, digest)
+                self.scheduler.call_later(last[1] + self.window - now, self.executor.submit,
+                                          self._flush, key)
+                return None
+            self.sent[key] = (digest, now)
+        return self._send(bot, key, kwargs)
+
+    def _flush(self, key):
+        with self._lock:
+            bot, kwargs, digest = self.pending.pop(key)
+            last = self.sent.get(key)
+            if last and last[0] == digest:
+                return
+            self.sent[key] = (digest, time.monotonic())
+        try:
+            self._send(bot, key, kwargs)
+        except ntelebot.errors.Error as e:
+            logging.info('Unable to edit %r in %r: %r', key[2], key[1], e)
+
+    def _send(self, bot, key, kwargs):
+        _, chat_id, message_id = key
+        try:
+            return bot.edit_message_text(chat_id=chat_id, message_id=message_id, **kwargs)
+        except ntelebot.errors.Unmodified:
+            return None
+        except Exception:
+            # Don't let a failed edit suppress an identical retry.
+            self.sent.pop(key)
+            raise
+
+
+def _digest(kwargs):
+    return hashlib.blake2b(json.dumps(kwargs, sort_keys=True).encode('utf8'),
+                           digest_size=16).digest()
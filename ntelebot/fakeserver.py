@@ -0,0 +1,466 @@
+"""A local stand-in for the Telegram Bot API, for load testing and benchmarks."""
+
+import collections
+import email.parser
+import email.policy
+import http.server
+import itertools
+import json
+import math
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+import ntelebot
+
+# Methods that count against Telegram's flood limits.
+_SENDS = {
+    'copymessage', 'editmessagetext', 'forwardmessage', 'sendanimation', 'sendaudio',
+    'senddocument', 'sendmessage', 'sendphoto', 'sendsticker', 'sendvideo', 'sendvoice'
+}
+# sendX method -> the parameter (and Message field) carrying its file.
+_FILE_METHODS = {
+    f'send{kind}': kind
+    for kind in ('animation', 'audio', 'document', 'photo', 'sticker', 'video', 'voice')
+}
+_DESCRIPTIONS = {
+    400: 'Bad Request',
+    401: 'Unauthorized',
+    403: 'Forbidden: bot was blocked by the user',
+    404: 'Not Found',
+    409: 'Conflict: terminated by other getUpdates request; make sure that only one bot instance '
+         'is running',
+    429: 'Too Many Requests',
+    502: 'Bad Gateway',
+}
+
+
+class FakeServer:  # pylint: disable=too-many-instance-attributes
+    """A local, in-memory stand-in for https://api.telegram.org, served over real HTTP.
+
+    Bots created with Bot(token, base_url=server.base_url) can call getMe, getUpdates, sendMessage,
+    editMessageText, deleteMessage(s), answerCallbackQuery, answerInlineQuery, getFile, and the
+    send<file> methods (with uploads or file_ids), and download files from server.file_url. Any
+    token is accepted, and each gets its own update stream and chats.
+
+    Updates are queued with FakeServer.push, or drawn (as getUpdates asks for them) from any
+    iterable, including endless generators, given to FakeServer.feed. Overlapping getUpdates calls
+    for the same token get 409 Conflict, like Telegram's.
+
+    Every response is delayed by latency seconds (or latency() seconds, if callable). Errors can be
+    scripted with FakeServer.fail, or injected at random by error_rates ({error_code: probability}).
+    If flood_limits is set, sends and edits beyond ntelebot.limits' per-bot, per-chat, and per-group
+    rates get 429 Too Many Requests with a matching retry_after. FakeServer.requests counts the
+    calls made to each method.
+    """
+
+    MAX_MESSAGES = 100000  # Per bot, for editMessageText's sake.
+
+    def __init__(self,
+                 host='127.0.0.1',
+                 port=0,
+                 *,
+                 latency=0,
+                 error_rates=None,
+                 flood_limits=False,
+                 seed=None):
+        # pylint: disable=too-many-arguments
+        self.latency = latency
+        self.error_rates = error_rates or {}
+        self.flood_limits = flood_limits
+        self.random = random.Random(seed)
+        self.requests = collections.Counter()
+        self.bots = {}
+        self.files = {}
+        self._failures = []
+        self._cond = threading.Condition()
+        self.httpd = _HTTPServer((host, port), _Handler)
+        self.httpd.fake = self
+        host, port = self.httpd.server_address[:2]
+        self.base_url = f'http://{host}:{port}/bot'
+        self.file_url = f'http://{host}:{port}/file/bot'
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Begin serving requests (in a background thread)."""
+
+        self._thread = threading.Thread(target=self.httpd.serve_forever,
+                                        daemon=True,
+                                        name='ntelebot.fakeserver')
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving requests, and wake any blocked getUpdates calls."""
+
+        with self._cond:
+            for state in self.bots.values():
+                state.polls += 1
+            self._cond.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def push(self, token, *updates):
+        """Queue updates (without update_ids, which are assigned here) for token's getUpdates."""
+
+        with self._cond:
+            state = self._state(token)
+            for update in updates:
+                state.enqueue(update)
+            self._cond.notify_all()
+
+    def feed(self, token, updates):
+        """Draw token's updates from the iterable updates whenever its queue runs dry."""
+
+        with self._cond:
+            self._state(token).source = iter(updates)
+            self._cond.notify_all()
+
+    def fail(self, error_code, method=None, count=1, retry_after=None):
+        """Make the next count calls (to method, or any method) fail with error_code."""
+
+        with self._cond:
+            self._failures.append(
+                [method and method.lower().replace('_', ''), error_code, count, retry_after])
+
+    def _state(self, token):
+        if (state := self.bots.get(token)) is None:
+            state = self.bots[token] = _BotState(token)
+        return state
+
+    def handle(self, method, token, params, files):
+        """Return (HTTP status, response body) for a single API call."""
+
+        method = method.lower()
+        with self._cond:
+            self.requests[method] += 1
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        if (error := self._injected(method)):
+            return error
+
+        if method == 'getupdates':
+            return self._get_updates(token, params)
+        with self._cond:
+            state = self._state(token)
+            if self.flood_limits and method in _SENDS:
+                if (retry_after := state.throttle(params.get('chat_id'), time.monotonic())):
+                    return _error(429,
+                                  f'Too Many Requests: retry after {retry_after}',
+                                  retry_after=retry_after)
+            handler = getattr(self, f'_api_{method}', None)
+            if handler is None:
+                if method not in _FILE_METHODS:
+                    return _error(404)
+                return self._send_file(state, method, params, files)
+            return handler(state, params)
+
+    def _injected(self, method):
+        with self._cond:
+            for failure in self._failures:
+                if failure[0] in (None, method):
+                    _, error_code, count, retry_after = failure
+                    if count <= 1:
+                        self._failures.remove(failure)
+                    else:
+                        failure[2] -= 1
+                    return _error(error_code, retry_after=retry_after)
+        for error_code, rate in self.error_rates.items():
+            if self.random.random() < rate:
+                return _error(error_code, retry_after=1 if error_code == 429 else None)
+        return None
+
+    def _get_updates(self, token, params):
+        limit = min(max(int(params.get('limit') or 100), 1), 100)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        allowed_updates = params.get('allowed_updates')
+        with self._cond:
+            state = self._state(token)
+            state.polls += 1
+            generation = state.polls
+            # Any poll already waiting for this token now gets Conflict.
+            self._cond.notify_all()
+            if (offset := int(params.get('offset') or 0)) > 0:
+                while state.updates and state.updates[0]['update_id'] < offset:
+                    state.updates.popleft()
+            while True:
+                if state.polls != generation:
+                    return _error(409)
+                state.refill(limit, allowed_updates)
+                updates = list(itertools.islice(state.updates, limit))
+                if updates or (remaining := deadline - time.monotonic()) <= 0:
+                    return _ok(updates)
+                self._cond.wait(remaining)
+
+    def _api_getme(self, state, params):  # pylint: disable=unused-argument
+        return _ok(state.user)
+
+    def _api_sendmessage(self, state, params):
+        text = params.get('text')
+        if not text:
+            return _error(400, 'Bad Request: message text is empty')
+        if len(text) > ntelebot.limits.message_text_length_max:
+            return _error(400, 'Bad Request: message is too long')
+        return _ok(state.message(params, text=text))
+
+    def _api_editmessagetext(self, state, params):
+        if params.get('inline_message_id'):
+            return _ok(True)
+        message = state.messages.get((params.get('chat_id'), params.get('message_id')))
+        if message is None:
+            return _error(400, 'Bad Request: message to edit not found')
+        if (message.get('text') == params.get('text') and
+                message.get('reply_markup') == params.get('reply_markup')):
+            return _error(
+                400,
+                'Bad Request: message is not modified: specified new message content and reply '
+                'markup are exactly the same as a current content and reply markup of the message')
+        message.update(text=params.get('text'), edit_date=int(time.time()))
+        if params.get('reply_markup'):
+            message['reply_markup'] = params['reply_markup']
+        else:
+            message.pop('reply_markup', None)
+        return _ok(message)
+
+    def _api_deletemessage(self, state, params):
+        if state.messages.pop((params.get('chat_id'), params.get('message_id')), None) is None:
+            return _error(400, 'Bad Request: message to delete not found')
+        return _ok(True)
+
+    def _api_deletemessages(self, state, params):
+        for message_id in params.get('message_ids') or ():
+            state.messages.pop((params.get('chat_id'), message_id), None)
+        return _ok(True)
+
+    def _api_answercallbackquery(self, state, params):  # pylint: disable=unused-argument
+        return _ok(True)
+
+    def _api_answerinlinequery(self, state, params):  # pylint: disable=unused-argument
+        return _ok(True)
+
+    def _api_getfile(self, state, params):  # pylint: disable=unused-argument
+        if (record := self.files.get(params.get('file_id'))) is None:
+            return _error(400, 'Bad Request: invalid file_id')
+        return _ok(dict(record[0], file_path=f'{record[1]}/{params["file_id"]}'))
+
+    def _send_file(self, state, method, params, files):
+        kind = _FILE_METHODS[method]
+        value = params.get(kind)
+        if isinstance(value, str) and value.startswith('attach://'):
+            value = files.get(value[len('attach://'):])
+        if value is None:
+            return _error(400, f'Bad Request: there is no {kind} in the request')
+        if isinstance(value, str) and value in self.files:
+            info = self.files[value][0]
+        else:
+            data = value if isinstance(value, bytes) else value.encode('utf-8')
+            file_id = f'{kind}{len(self.files) + 1}'
+            info = {'file_id': file_id, 'file_unique_id': file_id, 'file_size': len(data)}
+            self.files[file_id] = (info, kind, data)
+        content = {kind: [info] if kind == 'photo' else info}
+        if params.get('caption'):
+            content['caption'] = params['caption']
+        return _ok(state.message(params, **content))
+
+    def download(self, file_path):
+        """Return (HTTP status, contents) for a download from FakeServer.file_url."""
+
+        record = self.files.get(file_path.rsplit('/', 1)[-1])
+        if record is None:
+            return 404, b'Not Found'
+        return 200, record[2]
+
+
+class _BotState:  # pylint: disable=too-many-instance-attributes
+    """A single token's updates, sent messages, and flood-limit history."""
+
+    def __init__(self, token):
+        bot_id = int(token.split(':', 1)[0]) if token.split(':', 1)[0].isdigit() else 0
+        self.user = {
+            'id': bot_id,
+            'is_bot': True,
+            'first_name': f'Fake bot {bot_id}',
+            'username': f'fake{bot_id}bot',
+        }
+        self.updates = collections.deque()
+        self.next_update_id = 1
+        self.source = None
+        self.polls = 0
+        self.messages = collections.OrderedDict()
+        self.message_ids = collections.Counter()
+        self.sent = collections.deque()
+        self.sent_by_chat = collections.defaultdict(collections.deque)
+
+    def enqueue(self, update):
+        """Queue update for getUpdates, assigning it the next update_id."""
+
+        self.updates.append(dict(update, update_id=self.next_update_id))
+        self.next_update_id += 1
+
+    def refill(self, limit, allowed_updates=None):
+        """Pull from source until there are limit updates queued (or it runs out).
+
+        Like Telegram, updates not of any of allowed_updates (if given) are discarded, not kept.
+        """
+
+        def allowed(update):
+            return not allowed_updates or any(key in update for key in allowed_updates)
+
+        if allowed_updates:
+            self.updates = collections.deque(filter(allowed, self.updates))
+        while self.source is not None and len(self.updates) < limit:
+            try:
+                self.enqueue(next(self.source))
+            except StopIteration:
+                self.source = None
+            else:
+                if not allowed(self.updates[-1]):
+                    self.updates.pop()
+
+    def message(self, params, **content):
+        """Record and return a new Message sent to params['chat_id']."""
+
+        chat_id = params.get('chat_id')
+        self.message_ids[chat_id] += 1
+        message = {
+            'message_id': self.message_ids[chat_id],
+            'from': self.user,
+            'chat': {
+                'id': chat_id,
+                'type': 'private' if isinstance(chat_id, int) and chat_id > 0 else 'supergroup',
+            },
+            'date': int(time.time()),
+            **content,
+        }
+        if params.get('reply_markup'):
+            message['reply_markup'] = params['reply_markup']
+        self.messages[(chat_id, message['message_id'])] = message
+        while len(self.messages) > FakeServer.MAX_MESSAGES:
+            self.messages.popitem(last=False)
+        return message
+
+    def throttle(self, chat_id, now):
+        """Record a send to chat_id, unless it's over a flood limit (then return retry_after)."""
+
+        # (Window length, max sends per window, send history.)
+        windows = [(1, ntelebot.limits.messages_per_second_max, self.sent)]
+        if isinstance(chat_id, int) and chat_id < 0:
+            windows.append(
+                (60, ntelebot.limits.messages_per_minute_per_group_max, self.sent_by_chat[chat_id]))
+        else:
+            windows.append(
+                (1, ntelebot.limits.messages_per_second_per_chat_max, self.sent_by_chat[chat_id]))
+        retry_after = 0
+        for window, limit, history in windows:
+            while history and history[0] <= now - window:
+                history.popleft()
+            if len(history) >= limit:
+                retry_after = max(retry_after, math.ceil(history[0] + window - now))
+        if retry_after:
+            return retry_after
+        for _, _, history in windows:
+            history.append(now)
+        return 0
+
+
+class _HTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients (like Loop.stop interrupting a long poll) routinely hang up mid-request.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections alive, like Telegram's servers.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name,missing-function-docstring
+        self.do_POST()
+
+    def do_POST(self):  # pylint: disable=invalid-name,missing-function-docstring
+        fake = self.server.fake
+        url = urllib.parse.urlsplit(self.path)
+        parts = url.path.split('/')
+        try:
+            params, files = _parse(self, url.query)
+        except ValueError:
+            self._reply(*_error(400, 'Bad Request: invalid request body'))
+            return
+        if len(parts) == 3 and parts[1].startswith('bot'):
+            self._reply(*fake.handle(parts[2], parts[1][len('bot'):], params, files))
+        elif len(parts) >= 4 and parts[1] == 'file' and parts[2].startswith('bot'):
+            status, body = fake.download('/'.join(parts[3:]))
+            self._reply(status, body, 'application/octet-stream')
+        else:
+            self._reply(*_error(404))
+
+    def _reply(self, status, body, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def _parse(handler, query):
+    """Return the params (and uploaded files) of a JSON, form, or multipart request."""
+
+    params = dict(urllib.parse.parse_qsl(query))
+    files = {}
+    body = handler.rfile.read(int(handler.headers.get('Content-Length') or 0))
+    content_type = handler.headers.get('Content-Type', '')
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        params.update(urllib.parse.parse_qsl(body.decode('utf-8')))
+    elif content_type.startswith('multipart/form-data'):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8') + body)
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            data = part.get_payload(decode=True)
+            if part.get_filename() is not None:
+                files[name] = data
+            else:
+                params[name] = data.decode('utf-8')
+    # Form values are JSON-encoded when they aren't plain strings (see ntelebot.bot._prepare).
+    for key, value in params.items():
+        if key not in ('caption', 'text'):
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                pass
+    if content_type.startswith('application/json'):
+        params.update(json.loads(body or b'{}'))
+    return params, files
+
+
+def _ok(result):
+    return 200, {'ok': True, 'result': result}
+
+
+def _error(error_code, description=None, retry_after=None):
+    data = {
+        'ok': False,
+        'error_code': error_code,
+        'description': description or _DESCRIPTIONS.get(error_code, 'Error'),
+    }
+    if retry_after is not None:
+        data['parameters'] = {'retry_after': retry_after}
+        if description is None:
+            data['description'] = f'Too Many Requests: retry after {retry_after}'
+    return error_code, data
@@ -2,6 +2,18 @@
 
 import base64
 import json
+import struct
+import zlib
+
+# Compact values are prefixed with '~' (which isn't in the URL-safe base64 alphabet, so can't start
+# a legacy value), then base64 (without padding) of a version byte and the packed value.
+_COMPACT = '~'
+_RAW = 1
+_DEFLATE = 2  # The packed value is raw-deflate compressed.
+_COMPRESS_MIN = 128  # Shorter packed values rarely shrink enough to be worth the time.
+_DECOMPRESS_MAX = 1 << 16
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT = range(8)
 
 
 def _decode_text(text):
@@ -49,6 +61,185 @@ def _encode_json(data):
     return _encode_text(json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True))
 
 
+def _pack_varint(out, n):
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _unpack_varint(data, pos):
+    n = data[pos]
+    if n < 0x80:
+        return n, pos + 1
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _pack_str(out, text):
+    text = text.encode('utf-8')
+    _pack_varint(out, len(text))
+    out += text
+
+
+def _unpack_str(data, pos):
+    length, pos = _unpack_varint(data, pos)
+    if pos + length > len(data):
+        raise ValueError('Truncated string.')
+    return data[pos:pos + length].decode('utf-8'), pos + length
+
+
+def _pack(out, value):  # pylint: disable=too-many-branches
+    """Append a tagged encoding of value (which must be representable as JSON) to out."""
+
+    # Checked roughly in order of how common each type is in meta.
+    kind = type(value)
+    if kind is str:
+        out.append(_STR)
+        _pack_str(out, value)
+    elif kind is int:
+        out.append(_INT)
+        _pack_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif kind is dict:
+        out.append(_DICT)
+        _pack_varint(out, len(value))
+        for k, v in value.items():
+            if type(k) is not str:  # pylint: disable=unidiomatic-typecheck
+                raise TypeError(f'Keys must be strings, not {type(k).__name__}.')
+            _pack_str(out, k)
+            _pack(out, v)
+    elif kind in (list, tuple):
+        out.append(_LIST)
+        _pack_varint(out, len(value))
+        for item in value:
+            _pack(out, item)
+    elif value is None:
+        out.append(_NONE)
+    elif value is False:
+        out.append(_FALSE)
+    elif value is True:
+        out.append(_TRUE)
+    elif kind is float:
+        out.append(_FLOAT)
+        out += struct.pack('<d', value)
+    else:
+        raise TypeError(f'Unable to pack {kind.__name__}.')
+
+
+def _unpack(data, pos):  # pylint: disable=too-many-return-statements
+    """Return the value whose tagged encoding begins at data[pos], and the position after it."""
+
+    tag = data[pos]
+    pos += 1
+    if tag == _STR:
+        return _unpack_str(data, pos)
+    if tag == _INT:
+        n, pos = _unpack_varint(data, pos)
+        return -(n + 1) >> 1 if n & 1 else n >> 1, pos
+    if tag == _DICT:
+        length, pos = _unpack_varint(data, pos)
+        items = {}
+        for _ in range(length):
+            k, pos = _unpack_str(data, pos)
+            items[k], pos = _unpack(data, pos)
+        return items, pos
+    if tag == _LIST:
+        length, pos = _unpack_varint(data, pos)
+        items = []
+        for _ in range(length):
+            item, pos = _unpack(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == _NONE:
+        return None, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FLOAT:
+        return struct.unpack_from('<d', data, pos)[0], pos + 8
+    raise ValueError(f'Unknown tag {tag}.')
+
+
+def _decode_compact(text):
+    try:
+        data = base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+        if data[0] == _DEFLATE:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            packed = decompressor.decompress(data[1:], _DECOMPRESS_MAX)
+            if decompressor.unconsumed_tail or not decompressor.eof:
+                return None
+        elif data[0] == _RAW:
+            packed = data[1:]
+        else:
+            return None
+        value, pos = _unpack(packed, 0)
+    except (IndexError, ValueError, struct.error, zlib.error):
+        # (binascii.Error and UnicodeDecodeError are both ValueErrors.)
+        return None
+    if pos == len(packed):
+        return value
+
+
+def _encode_compact(value, deflated_only=False):
+    packed = bytearray()
+    _pack(packed, value)
+    data = bytes((_RAW,)) + packed
+    if len(packed) >= _COMPRESS_MIN:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(packed) + compressor.flush()
+        if len(compressed) < len(packed):
+            data = bytes((_DEFLATE,)) + compressed
+    if deflated_only and data[0] != _DEFLATE:
+        return None
+    return _COMPACT + base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _decode_btn(text):
+    if not text.startswith(_COMPACT):
+        return _decode_list(text)
+    btn = _decode_compact(text[len(_COMPACT):])
+    if isinstance(btn, str):
+        return btn.split('\0')
+
+
+def _encode_btn(btn):
+    # NUL-joined prefixes are already about as dense as they get, so the compact format only wins
+    # when compression does.
+    legacy = _encode_list(btn)
+    if len(legacy) >= _COMPRESS_MIN:
+        compact = _encode_compact('\0'.join(btn))
+        if len(compact) < len(legacy):
+            return compact
+    return legacy
+
+
+def _decode_meta(text):
+    if not text.startswith(_COMPACT):
+        return _decode_json(text)
+    return _decode_compact(text[len(_COMPACT):])
+
+
+def _encode_meta(meta):
+    # JSON decodes faster than the packed format (and meta is decoded on every callback query), so
+    # the compact format is only used when compression makes it smaller.
+    legacy = _encode_json(meta)
+    if len(legacy) >= _COMPRESS_MIN:
+        try:
+            compact = _encode_compact(meta, deflated_only=True)
+        except TypeError:
+            return legacy
+        if compact and len(compact) < len(legacy):
+            return compact
+    return legacy
+
+
 def decode(entities):
     """Extract metadata hidden inside invisible links."""
 
@@ -58,9 +249,9 @@ def decode(entities):
         if entity['type'] == 'text_link':
             url = entity['url']
             if url.startswith('tg://btn/'):
-                btn = _decode_list(url[len('tg://btn/'):])
+                btn = _decode_btn(url[len('tg://btn/'):])
             elif url.startswith('tg://meta/'):
-                meta = _decode_json(url[len('tg://meta/'):])
+                meta = _decode_meta(url[len('tg://meta/'):])
                 if not isinstance(meta, dict):
                     meta = None
             if btn and meta:
@@ -70,11 +261,15 @@ def decode(entities):
 
 
 def encode(btn, meta):
-    """Hide metadata inside invisible links."""
+    """Hide metadata inside invisible links.
+
+    Both are written in the legacy format unless the compact (versioned, packed, and compressed)
+    format makes them smaller. decode accepts either.
+    """
 
     text = ''
     if btn:
-        text = f'{text}<a href="tg://btn/{_encode_list(btn)}">\u200b</a>'
+        text = f'{text}<a href="tg://btn/{_encode_btn(btn)}">\u200b</a>'
     if meta:
-        text = f'{text}<a href="tg://meta/{_encode_json(meta)}">\u200b</a>'
+        text = f'{text}<a href="tg://meta/{_encode_meta(meta)}">\u200b</a>'
     return text
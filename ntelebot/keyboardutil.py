@@ -1,7 +1,12 @@
 """Quick implementation of https://github.com/nmlorg/metabot/issues/1."""
 
+import bisect
+import copy
+import json
 import re
 
+import ntelebot
+
 
 def combine(prefixes, text):
     """Convert '\0idx\0suffix' to prefixes[int(idx)] + 'suffix'."""
@@ -32,19 +37,50 @@ def fix(keyboard, maxlen=64):
     return prefixes
 
 
+class FrozenKeyboard(dict):
+    """An inline keyboard's reply_markup, prepared once to be sent any number of times.
+
+    Over-long callback_data is encoded (as by fix, but on a copy of keyboard), and the resulting
+    prefixes, the invisible link carrying them (used by Context.reply_text), and the markup's JSON
+    (spliced into requests by Bot) are all computed up front, so each send only has to handle its
+    own text and meta. Don't modify a FrozenKeyboard after creating it, and if any callback_data
+    had to be encoded, only send it with parse_mode='HTML' (so the invisible link can be added).
+    """
+
+    def __init__(self, keyboard, maxlen=64):
+        keyboard = copy.deepcopy(keyboard)
+        super().__init__(inline_keyboard=keyboard)
+        self.prefixes = fix(keyboard, maxlen)
+        self.btn_link = ntelebot.invislink.encode(self.prefixes, None)
+        self.json = json.dumps(self)
+
+
 def shorten_lines(lines, maxlen):
-    """Generate a list of shared prefixes and a map of long string -> encoded string."""
+    """Generate a list of shared prefixes and a map of long string -> encoded string.
+
+    Lines are encoded longest first, each reusing the longest prefix already chosen for a longer
+    line if there is one, else adding its own shortest possible prefix. Any prefix a line could
+    share is at least as long as that shortest prefix, so this never uses more prefixes than
+    needed. Every prefix a line could reuse is between len(line) - maxlen and len(line) long, so
+    each line is matched with at most maxlen dict lookups rather than compared against every
+    prefix.
+    """
 
     prefixes = []
     mapping = {}
+    indexes = {}
+    lengths = []
     for line in sorted(lines, key=lambda line: -len(line)):
         if len(line) <= maxlen:
             # This could be moved into the else: below to minimize overall payload size, but leaving
             # lines that are already within the limit as is allows more buttons to remain functional
             # if a message's entities section is ever trimmed.
             break
-        for i, prefix in enumerate(prefixes):
-            if line.startswith(prefix):
+        # Lines only get shorter, so prefixes longer than this one will never match again.
+        while lengths and lengths[-1] > len(line):
+            lengths.pop()
+        for cut in reversed(lengths):
+            if (i := indexes.get(line[:cut])) is not None:
                 break
         else:
             i = len(prefixes)
@@ -54,5 +90,9 @@ def shorten_lines(lines, maxlen):
             # possible reuse between lines.
             prefix = line[:-(maxlen - len(prefixcode))]
             prefixes.append(prefix)
-        mapping[line] = f'\0{i}\0{line[len(prefix):]}'
+            indexes[prefix] = i
+            cut = len(prefix)
+            if cut not in lengths:
+                bisect.insort(lengths, cut)
+        mapping[line] = f'\0{i}\0{line[cut:]}'
     return prefixes, mapping
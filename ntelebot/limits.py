@@ -1,4 +1,8 @@
 """Arbitrary limits used by Telegram."""  # pylint: disable=invalid-name
 
+bulk_message_ids_max = 100  # deleteMessages, forwardMessages, and copyMessages.
 message_caption_length_max = 1024
 message_text_length_max = 4096
+messages_per_minute_per_group_max = 20
+messages_per_second_max = 30  # Across all chats, for bots without paid broadcasts enabled.
+messages_per_second_per_chat_max = 1
@@ -1,5 +1,6 @@
 """A thread-based long-poll watcher and synchronizer."""
 
+import collections
 import functools
 import logging
 import random
@@ -9,41 +10,119 @@ import time
 import ntelebot
 
 
-class Loop:
-    """A thread-based long-poll watcher and synchronizer."""
+class Loop:  # pylint: disable=too-many-instance-attributes
+    """A thread-based long-poll watcher and synchronizer.
 
+    If checkpoint (an ntelebot.checkpoint.FileCheckpoint or SqliteCheckpoint) is given, each bot
+    resumes polling just past the last update_id recorded there, and isn't polled again (which is
+    what tells Telegram its previous updates were handled) until everything from its last batch has
+    been dispatched and acked to the checkpoint. Updates received but not yet dispatched when the
+    process dies are then redelivered after a restart, rather than lost.
+
+    If high_water is given, pollers never let more than that many updates sit in (or be dispatched
+    from) the queue at once: each asks Telegram for at most the remaining headroom, and pauses
+    entirely while there is none, leaving the rest buffered on Telegram's side. (Loop.backlog counts
+    those updates; anything else scheduled on Loop.queue, like putwhen timers, doesn't count.)
+
+    Updates whose answers are only useful for a short time are shed, rather than dispatched, once
+    they have waited in the queue longer than max_ages[update type] seconds (by default MAX_AGES):
+    stale inline queries are dropped and stale callback queries get an empty answer (just clearing
+    the client's spinner). Loop.shed counts how many of each type were shed.
+
+    Updates are dispatched in arrival order, except that each update type listed in priorities (by
+    default PRIORITIES, or as overridden for individual bots by Loop.add) is treated as if it had
+    arrived that many seconds earlier. Interactive updates therefore jump ahead of a backlog of
+    group chatter, but never by more than their boost, so nothing waits forever.
+    """
+
+    MAX_AGES = {'callback_query': 10, 'inline_query': 10}
+    PRIORITIES = {'callback_query': 5, 'inline_query': 5}
     stopped = False
 
-    def __init__(self):
+    def __init__(self, checkpoint=None, high_water=None, max_ages=None, priorities=None):
         self.queue = ntelebot.delayqueue.DelayQueue()
-        self.active = set()
+        self.pollers = {}
+        self._retiring = {}
+        self._lock = threading.Lock()
+        self.checkpoint = checkpoint
+        self.high_water = high_water
+        self.max_ages = self.MAX_AGES if max_ages is None else max_ages
+        self.priorities = self.PRIORITIES if priorities is None else priorities
+        self.shed = collections.Counter()
+        self.backlog = 0
+        self._reserved = 0
+        self._headroom = threading.Condition()
+
+    def add(self, bot, dispatcher, priorities=None, allowed_updates=None):
+        """Begin polling bot for updates to be fed into dispatcher by Loop.run.
 
-    def add(self, bot, dispatcher):
-        """Begin polling bot for updates to be fed into dispatcher by Loop.run."""
+        If given, priorities replaces Loop.priorities for updates from this bot.
 
-        if bot.token not in self.active:
-            self.active.add(bot.token)
-            threading.Thread(target=self._poll_bot,
-                             args=(bot, dispatcher),
-                             daemon=True,
-                             name=f'@{bot.username}').start()
+        Only the update types in allowed_updates (by default, dispatcher.allowed_updates, as
+        recomputed before every poll) are requested from Telegram; if neither is available,
+        Telegram's own setting is left alone.
+        """
+
+        with self._lock:
+            if bot.token in self.pollers:
+                return
+            # If the token was just removed, its old poller may still be unwinding; the new one will
+            # wait for it to exit rather than racing it (and getting Conflict errors).
+            previous = self._retiring.pop(bot.token, None)
+            poller = self.pollers[bot.token] = _Poller(bot, dispatcher, priorities, allowed_updates,
+                                                       previous)
+            # Started while still holding the lock, so a poller waiting on this one (after a
+            # concurrent remove and add) can always join its thread.
+            poller.thread = threading.Thread(target=self._poll_bot,
+                                             args=(poller,),
+                                             daemon=True,
+                                             name=_thread_name(bot))
+            poller.thread.start()
 
     def remove(self, token):
-        """Stop polling for updates for the given API Token."""
+        """Stop polling for updates for the given API Token, aborting any poll in progress."""
+
+        with self._lock:
+            poller = self.pollers.pop(token)
+            self._retiring[token] = poller
+        self._stop_poller(poller)
+
+    def _stop_poller(self, poller):
+        poller.stop()
+        with self._headroom:
+            self._headroom.notify_all()
+
+    def _halted(self, poller):
+        return self.stopped or poller.stopped.is_set()
 
-        self.active.remove(token)
+    def _poll_bot(self, poller):
+        if poller.previous:
+            poller.previous.thread.join()
+            poller.previous = None
+        try:
+            self._poll(poller)
+        finally:
+            with self._lock:
+                if self._retiring.get(poller.bot.token) is poller:
+                    del self._retiring[poller.bot.token]
 
-    def _poll_bot(self, bot, dispatcher):  # pylint: disable=too-many-branches
+    def _poll(self, poller):  # pylint: disable=too-many-branches
+        bot = poller.bot
         backoff = 0
         offset = None
-        while not self.stopped and bot.token in self.active:
+        if self.checkpoint and (last := self.checkpoint.get(bot.token)) is not None:
+            offset = last + 1
+        while not self._halted(poller):
             if backoff:
                 logging.debug('Backing off for %r seconds.', backoff)
-                time.sleep(backoff)
+                if poller.stopped.wait(backoff):
+                    break
             backoff = max(min(backoff * 2, 30), 1) * (random.random() + .5)
             timeout = max(0, bot.timeout - 2)
+            if (kwargs := self._poll_params(poller)) is None:
+                break
             try:
-                updates = bot.get_updates(offset=offset, timeout=timeout)
+                updates = bot.get_updates(offset=offset, timeout=timeout, **kwargs)
             except ntelebot.errors.Conflict:
                 logging.error('Another process is using this bot token.')
             except ntelebot.errors.Unauthorized:
@@ -53,7 +132,8 @@ class Loop:
                     'Asked Telegram to return after %r seconds, then waited %r with no reply!',
                     timeout, bot.timeout)
             except (ntelebot.requests.ConnectionError, ntelebot.requests.ReadTimeout) as e:
-                logging.info('Transport error while polling: %r', e)
+                if not self._halted(poller):
+                    logging.info('Transport error while polling: %r', e)
             except ntelebot.errors.BadGateway as e:
                 logging.info('Server error while polling: %r', e)
             except ntelebot.errors.TooManyRequests as e:
@@ -64,10 +144,97 @@ class Loop:
                 logging.exception('Ignoring uncaught error while polling:')
             else:
                 backoff = 0
-                if not self.stopped and updates and bot.token in self.active:
+                if updates and not self._halted(poller):
                     offset = updates[-1]['update_id'] + 1
-                    for update in updates:
-                        self.queue.put(functools.partial(dispatcher, bot, update))
+                    batch = self._enqueue(bot, poller.dispatcher, poller.priorities, updates)
+                    self._release(kwargs.get('limit'))
+                    # Don't poll again (which would tell Telegram these updates were handled)
+                    # until every one of them has actually been dispatched.
+                    while batch and not batch.done.wait(1):
+                        if self._halted(poller):
+                            return
+                    continue
+            self._release(kwargs.get('limit'))
+
+    def _poll_params(self, poller):
+        """Build the optional Bot.get_updates arguments for poller's next poll (None if halted)."""
+
+        kwargs = {}
+        if self.high_water:
+            if not (limit := self._reserve(poller)):
+                return None
+            kwargs['limit'] = limit
+        dispatcher = poller.dispatcher
+        if (types := poller.allowed_updates or getattr(dispatcher, 'allowed_updates', None)):
+            # Telegram only sends chat_member when asked to, and it's only needed to keep a bot's
+            # read-through cache fresh.
+            if getattr(poller.bot, 'cache', None) and 'chat_member' not in types:
+                types = sorted((*types, 'chat_member'))
+            kwargs['allowed_updates'] = types
+        return kwargs
+
+    def _enqueue(self, bot, dispatcher, priorities, updates):
+        """Queue updates for Loop.run, returning the _Batch tracking them if checkpointing."""
+
+        if priorities is None:
+            priorities = self.priorities
+        dispatcher = functools.partial(self._dispatch, dispatcher, time.monotonic())
+        batch = self.checkpoint and _Batch(self.checkpoint, bot.token, updates)
+        with self._headroom:
+            self.backlog += len(updates)
+        for update in updates:
+            if batch:
+                callback = functools.partial(batch.dispatch, dispatcher, bot, update)
+            else:
+                callback = functools.partial(dispatcher, bot, update)
+            self.queue.putafter(-priorities.get(_update_type(update), 0), callback)
+        return batch
+
+    def _dispatch(self, dispatcher, received, bot, update):
+        """Feed update through dispatcher, unless it has been waiting too long to be useful."""
+
+        try:
+            kind = _update_type(update)
+            max_age = self.max_ages.get(kind)
+            if max_age is None or time.monotonic() - received <= max_age:
+                return dispatcher(bot, update)
+
+            self.shed[kind] += 1
+            logging.debug('Shedding %s received %.1f seconds ago.', kind,
+                          time.monotonic() - received)
+            if kind == 'callback_query':
+                try:
+                    bot.answer_callback_query(callback_query_id=update['callback_query']['id'])
+                except ntelebot.errors.Error as e:
+                    logging.info('Unable to answer stale callback query: %r', e)
+            return None
+        finally:
+            with self._headroom:
+                self.backlog -= 1
+                self._headroom.notify_all()
+
+    def _reserve(self, poller):
+        """Wait for room under high_water, then claim up to 100 slots for poller's next poll.
+
+        Returns 0 if the loop or poller was stopped while waiting.
+        """
+
+        with self._headroom:
+            while (headroom := self.high_water - self.backlog - self._reserved) <= 0:
+                if self._halted(poller):
+                    return 0
+                self._headroom.wait(1)
+            limit = min(headroom, 100)
+            self._reserved += limit
+            return limit
+
+    def _release(self, limit):
+        """Return slots claimed by _reserve (now either filled by queued updates or unused)."""
+
+        if limit:
+            with self._headroom:
+                self._reserved -= limit
+                self._headroom.notify_all()
 
     def run(self):
         """Wait for updates received from Loop.add and feed them through the given dispatcher."""
@@ -80,16 +247,85 @@ class Loop:
                 except Exception:  # pylint: disable=broad-except
                     logging.exception('Ignoring uncaught error while dispatching:')
             self.queue.task_done()
+        if self.checkpoint:
+            self.checkpoint.flush()
 
     def stop(self):
         """Stop polling for updates and return as soon as all acked updates have been dispatched.
 
-        Threads created by Loop.add will continue waiting for updates, but will either timeout or
-        discard all updates received. In the latter case, an update is not marked as "acknowledged"
-        until a call to Bot.get_updates with an offset of 1 higher than its update_id is made, so
-        discarded updates will be resent the next time the bot is polled.
+        Threads created by Loop.add have their in-flight Bot.get_updates aborted, and discard any
+        updates that still manage to arrive. An update is not marked as "acknowledged" until a call
+        to Bot.get_updates with an offset of 1 higher than its update_id is made, so discarded
+        updates will be resent the next time the bot is polled.
         """
 
         if not self.stopped:
             self.stopped = True
-            self.queue.put(None)
+            with self._lock:
+                pollers = list(self.pollers.values())
+            for poller in pollers:
+                self._stop_poller(poller)
+            # Queued on the same (monotonic) clock as updates, so everything already received is
+            # still dispatched first.
+            self.queue.putafter(0, None)
+
+
+class _Poller:  # pylint: disable=too-few-public-methods
+    """A handle on the thread polling a single bot, whose in-flight poll can be aborted."""
+
+    def __init__(self, bot, dispatcher, priorities, allowed_updates, previous):
+        # pylint: disable=too-many-arguments
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.priorities = priorities
+        self.allowed_updates = allowed_updates
+        self.previous = previous
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def stop(self):
+        """Ask the thread to exit, closing the connection of any Bot.get_updates it's blocked in."""
+
+        self.stopped.set()
+        # Once the thread has exited, its ident may belong to some other thread.
+        if self.thread and self.thread.is_alive():
+            ntelebot.requests.interrupt(self.thread.ident)
+
+
+def _thread_name(bot):
+    # Don't force a get_me just to name a thread: the username is looked up lazily when needed.
+    if (username := getattr(bot, '_username', None)):
+        return f'@{username}'
+    return f'bot{bot.token.split(":", 1)[0]}'
+
+
+def _update_type(update):
+    for key in update:
+        if key != 'update_id':
+            return key
+    return None
+
+
+class _Batch:  # pylint: disable=too-few-public-methods
+    """Acks a batch of updates to a checkpoint once all of them have been dispatched."""
+
+    def __init__(self, checkpoint, token, updates):
+        self.checkpoint = checkpoint
+        self.token = token
+        self.last_id = updates[-1]['update_id']
+        self.remaining = len(updates)
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def dispatch(self, dispatcher, bot, update):
+        """Dispatch update, then ack the batch if it was the last one outstanding."""
+
+        try:
+            return dispatcher(bot, update)
+        finally:
+            with self.lock:
+                self.remaining -= 1
+                finished = not self.remaining
+            if finished:
+                self.checkpoint.ack(self.token, self.last_id)
+                self.done.set()
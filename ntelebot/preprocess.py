@@ -1,7 +1,5 @@
 """Non-universal, but fairly versatile update preprocessor."""
 
-import threading
-
 import ntelebot
 
 PRIVATE_RESPONSE_TEXT = """\
@@ -14,16 +12,53 @@ button below and your Telegram app will do all that automatically.
 (I'll delete this in a minute.)"""
 
 
-class Preprocessor:  # pylint: disable=too-few-public-methods
-    """Non-universal, but fairly versatile update preprocessor."""
+class Preprocessor:
+    """Non-universal, but fairly versatile update preprocessor.
+
+    If edits (an ntelebot.editmanager.EditManager) is given, edits made by Context.reply_text (to
+    callback_query messages) are routed through it.
+
+    If store (an ntelebot.callbackstore.CallbackStore) is given, over-long callback_data and
+    Context.meta are kept there, with buttons carrying only short ids, rather than in invisible
+    links in the message itself. Callback queries from buttons it doesn't recognize (including those
+    sent before the store was in use) are still decoded from any invisible links.
+    """
 
-    def __init__(self):
+    # The update types understood by __call__, and the Context types each can become. (Update types
+    # that never become a Context are still processed for their side effects. chat_member is also
+    # understood, but only worth its traffic to bots with a read-through cache, so Loop requests it
+    # itself.)
+    UPDATE_TYPES = {
+        'callback_query': ('callback_query',),
+        'channel_post': ('join', 'message', 'pin'),
+        'inline_query': ('inline_query',),
+        'message': ('join', 'message', 'pin'),
+        'my_chat_member': (),
+    }
+
+    def __init__(self, autodelete=None, edits=None, store=None):
         self.conversations = {}
+        self.autodelete = autodelete
+        self.edits = edits
+        self.store = store
+
+    def allowed_updates(self, ctx_types=None):
+        """Return the update types that could become any of ctx_types (None for all)."""
+
+        return [
+            update_type for update_type, types in self.UPDATE_TYPES.items()
+            if ctx_types is None or not types or set(types) & set(ctx_types)
+        ]
 
-    def __call__(self, bot, update):  # pylint: disable=too-many-branches,too-many-statements
+    def __call__(self, bot, update):
         """Convert a Telegram Update instance into a normalized Context."""
 
-        ctx = Context(self.conversations, bot)
+        # pylint: disable=too-many-branches,too-many-return-statements,too-many-statements
+        ctx = Context(self.conversations,
+                      bot,
+                      autodelete=self.autodelete,
+                      edits=self.edits,
+                      store=self.store)
 
         payload = update.get('message') or update.get('channel_post')
 
@@ -32,6 +67,13 @@ class Preprocessor:  # pylint: disable=too-few-public-methods
             ctx.chat = payload['chat']
             ctx.reply_id = payload['message_id']
 
+            if ctx.user and (ctx.chat['type'] == 'private' or
+                             get_command(payload.get('text', ''), bot.username)[0] == 'start'):
+                bot.unreachable.pop(ctx.user['id'])
+
+            if payload.get('new_chat_members') or payload.get('left_chat_member'):
+                bot.invalidate(ctx.chat['id'])
+
             if (new_chat_members := payload.get('new_chat_members')):
                 ctx.type = 'join'
                 ctx.data = new_chat_members
@@ -57,7 +99,7 @@ class Preprocessor:  # pylint: disable=too-few-public-methods
             if text.startswith('/start ') or text.startswith(f'/start@{bot.username.lower()} '):
                 text = text.split(None, 1)[1]
             if not text.startswith('/'):
-                tmp = ntelebot.deeplink.decode(text)
+                tmp = ntelebot.deeplink.decode(text, bot.deeplinks)
                 if tmp.startswith('/'):
                     text = tmp
             if ctx.user and ctx.chat['type'] == 'private':
@@ -92,12 +134,15 @@ class Preprocessor:  # pylint: disable=too-few-public-methods
             ctx.edit_id = payload['message']['message_id']
             ctx.callback_id = payload['id']
             text = payload['data']
-            if (entities := payload['message'].get('entities')):
+            meta = None
+            if self.store:
+                text, meta = self.store.combine(text)
+            if meta is None and (entities := payload['message'].get('entities')):
                 prefixes, meta = ntelebot.invislink.decode(entities)
                 if prefixes:
                     text = ntelebot.keyboardutil.combine(prefixes, text)
-                if meta:
-                    ctx.meta = meta
+            if meta:
+                ctx.meta = meta
             ctx.command, ctx.text = get_command(text, bot.username)
             ctx.prefix = ctx.text.partition(' ')[0]
             return ctx
@@ -111,6 +156,22 @@ class Preprocessor:  # pylint: disable=too-few-public-methods
             ctx.prefix = ctx.text.partition(' ')[0]
             return ctx
 
+        if update.get('chat_member'):
+            payload = update['chat_member']
+            bot.invalidate(payload['chat']['id'], payload['new_chat_member']['user']['id'])
+            return
+
+        if update.get('my_chat_member'):
+            payload = update['my_chat_member']
+            bot.invalidate(payload['chat']['id'], payload['new_chat_member']['user']['id'])
+            # The user blocked, unblocked, or otherwise (re)opened their private chat with the bot.
+            if payload['chat']['type'] == 'private':
+                if payload['new_chat_member']['status'] == 'kicked':
+                    bot.unreachable[payload['from']['id']] = True
+                else:
+                    bot.unreachable.pop(payload['from']['id'])
+            return
+
 
 class Context:
     """Normalized presentation of an incoming message or event.
@@ -130,8 +191,12 @@ class Context:
     reply_id = edit_id = answer_id = None
     callback_id = None
 
-    def __init__(self, conversations, bot):
+    def __init__(self, conversations, bot, autodelete=None, edits=None, store=None):
+        # pylint: disable=too-many-arguments
         self._conversations = conversations
+        self._autodelete = autodelete
+        self._edits = edits
+        self._store = store
         self.bot = bot
         self.meta = {}
 
@@ -169,11 +234,24 @@ class Context:
         if args:
             text %= args
 
-        if kwargs.get('parse_mode') == 'HTML':
-            prefixes = None
-            if kwargs.get('reply_markup') and kwargs['reply_markup'].get('inline_keyboard'):
-                prefixes = ntelebot.keyboardutil.fix(kwargs['reply_markup']['inline_keyboard'])
-            text = f'{ntelebot.invislink.encode(prefixes, self.meta)}{text}'
+        reply_markup = kwargs.get('reply_markup')
+        keyboard = reply_markup and reply_markup.get('inline_keyboard')
+        if (isinstance(reply_markup, ntelebot.keyboardutil.FrozenKeyboard) and
+                reply_markup.prefixes and kwargs.get('parse_mode') != 'HTML'):
+            # Its encoded callback_data can only be decoded using the invisible link.
+            raise ValueError('A FrozenKeyboard with long callback_data must be sent as HTML.')
+        if (self._store and keyboard and
+                not isinstance(reply_markup, ntelebot.keyboardutil.FrozenKeyboard)):
+            self._store.fix(keyboard, self.meta)
+        elif kwargs.get('parse_mode') == 'HTML':
+            if isinstance(reply_markup, ntelebot.keyboardutil.FrozenKeyboard):
+                meta = ntelebot.invislink.encode(None, self.meta)
+                text = f'{reply_markup.btn_link}{meta}{text}'
+            else:
+                prefixes = None
+                if keyboard:
+                    prefixes = ntelebot.keyboardutil.fix(keyboard)
+                text = f'{ntelebot.invislink.encode(prefixes, self.meta)}{text}'
 
         if self.reply_id:
             if text.startswith('document:'):
@@ -201,37 +279,44 @@ class Context:
             if not self.private or not self.user:
                 return method(chat_id=self.chat['id'], reply_parameters=reply_parameters, **kwargs)
 
-            try:
-                message = method(chat_id=self.user['id'],
-                                 reply_parameters=reply_parameters,
-                                 **kwargs)
-                self.bot.send_message(chat_id=self.chat['id'],
-                                      text='(I replied in private.)',
-                                      reply_parameters=reply_parameters)
-                return message
-            except ntelebot.errors.Forbidden:
-                orig_text = self.text
-                if self.command:
-                    orig_text = f'/{self.command} {orig_text}'
-                keyboard = [[{
-                    'text': f'Resend {repr(orig_text)} in private',
-                    'url': self.bot.encode_url(orig_text),
-                }]]
-                message = self.bot.send_message(chat_id=self.chat['id'],
-                                                text=PRIVATE_RESPONSE_TEXT,
-                                                reply_parameters=reply_parameters,
-                                                reply_markup={'inline_keyboard': keyboard})
-                thr = threading.Timer(60,
-                                      self.bot.delete_message,
-                                      kwargs={
-                                          'chat_id': self.chat['id'],
-                                          'message_id': message['message_id']
-                                      })
-                thr.daemon = True
-                thr.start()
-                return message
+            # Users who are known not to have a private chat open skip straight to the fallback
+            # (saving a doomed round trip) until they message the bot privately.
+            if self.user['id'] not in self.bot.unreachable:
+                try:
+                    message = method(chat_id=self.user['id'],
+                                     reply_parameters=reply_parameters,
+                                     **kwargs)
+                except ntelebot.errors.Forbidden:
+                    self.bot.unreachable[self.user['id']] = True
+                else:
+                    self.bot.send_message(chat_id=self.chat['id'],
+                                          text='(I replied in private.)',
+                                          reply_parameters=reply_parameters)
+                    return message
+
+            orig_text = self.text
+            if self.command:
+                orig_text = f'/{self.command} {orig_text}'
+            keyboard = [[{
+                'text': f'Resend {repr(orig_text)} in private',
+                'url': self.bot.encode_url(orig_text),
+            }]]
+            message = self.bot.send_message(chat_id=self.chat['id'],
+                                            text=PRIVATE_RESPONSE_TEXT,
+                                            reply_parameters=reply_parameters,
+                                            reply_markup={'inline_keyboard': keyboard})
+            autodelete = self._autodelete or ntelebot.autodelete.shared()
+            autodelete.add(self.bot, self.chat['id'], message['message_id'], 60)
+            return message
 
         if self.edit_id:
+            if self._edits:
+                # See ntelebot.editmanager.EditManager: this may be deferred, coalesced, or dropped.
+                return self._edits.edit(self.bot,
+                                        self.chat['id'],
+                                        self.edit_id,
+                                        text=text,
+                                        **kwargs)
             return self.bot.edit_message_text(chat_id=self.chat['id'],
                                               message_id=self.edit_id,
                                               text=text,
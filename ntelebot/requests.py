@@ -2,6 +2,7 @@
 
 import socket
 import threading
+import weakref
 
 import requests
 from requests.exceptions import *  # pylint: disable=redefined-builtin,unused-wildcard-import,wildcard-import
@@ -29,7 +30,80 @@ class _KeepAliveAdapter(requests.adapters.HTTPAdapter):
             (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 30),
             (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 4),
         ]
-        return super().init_poolmanager(*args, **kwargs)
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _HTTPConnectionPool,
+            'https': _HTTPSConnectionPool,
+        }
+
+
+# Every connection opened by a given thread (which, thanks to _Local, only that thread ever uses).
+_CONNECTIONS = {}
+_CONNECTIONS_LOCK = threading.Lock()
+# Holds a _ThreadExit for each thread with an entry in _CONNECTIONS.
+_TRACKING = threading.local()
+
+
+class _ThreadExit:  # pylint: disable=too-few-public-methods
+    """Drops a thread's entry from _CONNECTIONS once its thread-locals are cleared (as it exits).
+
+    Otherwise entries would pile up, and a later thread reusing the same ident could have its
+    connections closed by an interrupt meant for the old one.
+    """
+
+    def __init__(self, ident, connections):
+        weakref.finalize(self, _forget, ident, connections)
+
+
+def _forget(ident, connections):
+    with _CONNECTIONS_LOCK:
+        if _CONNECTIONS.get(ident) is connections:
+            del _CONNECTIONS[ident]
+
+
+class _TrackedConnectionMixin:  # pylint: disable=too-few-public-methods
+
+    def connect(self):  # pylint: disable=missing-function-docstring
+        super().connect()
+        ident = threading.get_ident()
+        with _CONNECTIONS_LOCK:
+            if (connections := _CONNECTIONS.get(ident)) is None:
+                connections = _CONNECTIONS[ident] = weakref.WeakSet()
+                _TRACKING.exit = _ThreadExit(ident, connections)
+            connections.add(self)
+
+
+class _HTTPConnection(_TrackedConnectionMixin, urllib3.connection.HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_TrackedConnectionMixin, urllib3.connection.HTTPSConnection):
+    pass
+
+
+class _HTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+def interrupt(ident):
+    """Abort any request the given thread (by threading.get_ident) is blocked on.
+
+    The blocked call fails promptly with ConnectionError. Idle keep-alive connections held by the
+    thread are closed too, and are transparently reopened the next time it makes a request.
+    """
+
+    with _CONNECTIONS_LOCK:
+        connections = list(_CONNECTIONS.pop(ident, ()))
+    for conn in connections:
+        if (sock := conn.sock) is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
 
 
 _LOCAL = _Local()
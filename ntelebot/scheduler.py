@@ -0,0 +1,82 @@
+"""A single background thread that runs callbacks at scheduled times."""
+
+import concurrent.futures
+import functools
+import logging
+import threading
+
+import ntelebot
+
+
+class Scheduler:
+    """A single background thread that runs callbacks at scheduled times.
+
+    This replaces one threading.Timer (and one thread, and one requests.Session) per delayed call
+    with one worker thread fed by a DelayQueue. The thread is started on first use.
+
+    Callbacks should be quick, as each one delays all the others: anything that makes network calls
+    should hand them off to an executor (like shared_executor()) instead.
+    """
+
+    def __init__(self, name='ntelebot.scheduler'):
+        self.name = name
+        self.queue = ntelebot.delayqueue.DelayQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def call_at(self, when, func, *args, **kwargs):
+        """Run func(*args, **kwargs) once time.time() >= when."""
+
+        self._start()
+        return self.queue.putwhen(when, functools.partial(func, *args, **kwargs))
+
+    def call_later(self, delay, func, *args, **kwargs):
+        """Run func(*args, **kwargs) after delay seconds."""
+
+        self._start()
+        return self.queue.putafter(delay, functools.partial(func, *args, **kwargs))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            for callback in self.queue.get_due():
+                try:
+                    callback()
+                except Exception:  # pylint: disable=broad-except
+                    logging.exception('Ignoring uncaught error in scheduled callback:')
+                self.queue.task_done()
+
+
+_SHARED = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared():
+    """Return the process-wide Scheduler, creating it if necessary."""
+
+    global _SHARED  # pylint: disable=global-statement
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = Scheduler()
+        return _SHARED
+
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+_EXECUTOR_WORKERS = 8
+
+
+def shared_executor():
+    """Return the process-wide thread pool that scheduled callbacks hand slow work off to."""
+
+    global _EXECUTOR  # pylint: disable=global-statement
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+                _EXECUTOR_WORKERS, thread_name_prefix='ntelebot.scheduler.executor')
+        return _EXECUTOR
@@ -0,0 +1,289 @@
+"""Run Loops in several worker processes, sharding bot tokens across them."""
+
+import bisect
+import collections
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import ntelebot
+
+
+class HashRing:
+    """Consistently maps keys onto nodes.
+
+    Adding or removing a node only moves the keys that node gains or loses; every other key stays
+    where it was.
+    """
+
+    def __init__(self, nodes=(), replicas=64):
+        self.replicas = replicas
+        self._hashes = []
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self._hashes) // self.replicas
+
+    def add(self, node):
+        """Start mapping keys onto node."""
+
+        for i in range(self.replicas):
+            point = _hash(f'{node}:{i}')
+            i = bisect.bisect(self._hashes, point)
+            self._hashes.insert(i, point)
+            self._nodes.insert(i, node)
+
+    def remove(self, node):
+        """Stop mapping keys onto node."""
+
+        keep = [i for i, other in enumerate(self._nodes) if other != node]
+        self._hashes = [self._hashes[i] for i in keep]
+        self._nodes = [self._nodes[i] for i in keep]
+
+    def get(self, key):
+        """Return the node key maps onto."""
+
+        return self._nodes[bisect.bisect(self._hashes, _hash(key)) % len(self._nodes)]
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf8'), digest_size=8).digest(), 'big')
+
+
+class Supervisor:  # pylint: disable=too-many-instance-attributes
+    """Runs an ntelebot.loop.Loop in each of several worker processes, sharding tokens across them.
+
+    Each worker builds its own dispatcher by calling dispatcher_factory(), and its own bots by
+    calling bot_factory(token), so both must be picklable (e.g. module-level functions). Tokens are
+    assigned to workers by a HashRing, so add, remove, and resize only move the tokens they have
+    to. Workers that die are restarted (with their tokens) by Supervisor.run, and each worker
+    periodically reports its Loop's metrics, which Supervisor.metrics combines.
+    """
+
+    RESTART_DELAY = 1
+
+    def __init__(self,
+                 dispatcher_factory,
+                 tokens=(),
+                 processes=None,
+                 bot_factory=None,
+                 report_interval=5):  # pylint: disable=too-many-arguments
+        self.dispatcher_factory = dispatcher_factory
+        self.bot_factory = bot_factory or ntelebot.bot.Bot
+        self.report_interval = report_interval
+        self.processes = processes or os.cpu_count() or 1
+        self.ring = HashRing(range(self.processes))
+        self.workers = {index: _Worker(index) for index in range(self.processes)}
+        for token in tokens:
+            self.workers[self.ring.get(token)].tokens.add(token)
+        self.restarts = 0
+        self.stopped = threading.Event()
+        self._reports = multiprocessing.Queue()
+        self._lock = threading.Lock()
+
+    def add(self, token):
+        """Begin polling token in whichever worker it maps onto."""
+
+        with self._lock:
+            self.workers[self.ring.get(token)].add(token)
+
+    def remove(self, token):
+        """Stop polling token."""
+
+        with self._lock:
+            self.workers[self.ring.get(token)].remove(token)
+
+    def resize(self, processes):
+        """Grow or shrink the pool to processes workers, moving only the tokens that must move."""
+
+        with self._lock:
+            tokens = [token for worker in self.workers.values() for token in worker.tokens]
+            for index in range(self.processes, processes):
+                self.ring.add(index)
+                self.workers[index] = _Worker(index)
+            for index in range(processes, self.processes):
+                self.ring.remove(index)
+            for token in tokens:
+                owner = self.ring.get(token)
+                for worker in self.workers.values():
+                    if worker.index != owner and token in worker.tokens:
+                        worker.remove(token)
+                self.workers[owner].add(token)
+            for index in range(processes, self.processes):
+                self.workers.pop(index).stop()
+            self.processes = processes
+            if not self.stopped.is_set():
+                self._check()
+
+    def metrics(self):
+        """Combine the most recent report from each worker."""
+
+        self._drain()
+        totals = {'processes': self.processes, 'restarts': self.restarts}
+        shed = collections.Counter()
+        with self._lock:
+            for worker in self.workers.values():
+                for key, value in worker.report.items():
+                    if key == 'shed':
+                        shed.update(value)
+                    else:
+                        totals[key] = totals.get(key, 0) + value
+        totals['shed'] = shed
+        return totals
+
+    def run(self, interval=1):
+        """Start the workers, then keep them running until Supervisor.stop is called."""
+
+        with self._lock:
+            self._check()
+        while not self.stopped.wait(interval):
+            with self._lock:
+                self._check()
+            self._drain()
+        with self._lock:
+            for worker in self.workers.values():
+                worker.stop()
+        self._drain()
+
+    def stop(self):
+        """Ask Supervisor.run to stop all workers and return."""
+
+        self.stopped.set()
+
+    def _check(self):
+        """Start any worker that isn't running (yet, or any more)."""
+
+        now = time.monotonic()
+        for worker in self.workers.values():
+            if worker.process is None:
+                worker.start(self)
+            elif not worker.process.is_alive() and now - worker.started >= self.RESTART_DELAY:
+                logging.warning('Worker %s exited with %r; restarting.', worker.index,
+                                worker.process.exitcode)
+                self.restarts += 1
+                worker.start(self)
+
+    def _drain(self):
+        while True:
+            try:
+                index, report = self._reports.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                if (worker := self.workers.get(index)):
+                    worker.report = report
+
+
+class _Worker:
+    """The supervisor's handle on a single worker process."""
+
+    def __init__(self, index):
+        self.index = index
+        self.tokens = set()
+        self.process = None
+        self.commands = None
+        self.started = None
+        self.report = {}
+
+    def start(self, supervisor):
+        """(Re)start the process, handing it all of this worker's tokens."""
+
+        self.commands = multiprocessing.Queue()
+        for token in self.tokens:
+            self.commands.put(('add', token))
+        self.process = multiprocessing.Process(
+            target=_work,
+            args=(self.index, self.commands, supervisor._reports),  # pylint: disable=protected-access
+            kwargs={
+                'dispatcher_factory': supervisor.dispatcher_factory,
+                'bot_factory': supervisor.bot_factory,
+                'report_interval': supervisor.report_interval,
+            },
+            daemon=True,
+            name=f'ntelebot.supervisor.{self.index}')
+        self.started = time.monotonic()
+        self.report = {}
+        self.process.start()
+
+    def add(self, token):
+        """Assign token to this worker."""
+
+        if token not in self.tokens:
+            self.tokens.add(token)
+            if self.commands:
+                self.commands.put(('add', token))
+
+    def remove(self, token):
+        """Unassign token from this worker."""
+
+        if token in self.tokens:
+            self.tokens.remove(token)
+            if self.commands:
+                self.commands.put(('remove', token))
+
+    def stop(self, timeout=5):
+        """Ask the process to exit, killing it if it doesn't do so within timeout seconds."""
+
+        if self.process is None:
+            return
+        self.commands.put(('stop', None))
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class _CountingDispatcher:  # pylint: disable=too-few-public-methods
+    """Wraps a dispatcher, counting how many updates it has been fed."""
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.dispatched = 0
+
+    def __call__(self, bot, update):
+        self.dispatched += 1
+        return self.dispatcher(bot, update)
+
+    @property
+    def allowed_updates(self):  # pylint: disable=missing-function-docstring
+        return getattr(self.dispatcher, 'allowed_updates', None)
+
+
+def _work(index, commands, reports, *, dispatcher_factory, bot_factory, report_interval):
+    # pylint: disable=too-many-arguments
+    loop = ntelebot.loop.Loop()
+    dispatcher = _CountingDispatcher(dispatcher_factory())
+
+    def _report():
+        reports.put((index, {
+            'bots': len(loop.pollers),
+            'backlog': loop.backlog,
+            'dispatched': dispatcher.dispatched,
+            'shed': dict(loop.shed),
+        }))
+
+    def _listen():
+        while True:
+            try:
+                command, token = commands.get(timeout=report_interval)
+            except queue.Empty:
+                _report()
+                continue
+            if command == 'add':
+                loop.add(bot_factory(token), dispatcher)
+            elif command == 'remove':
+                loop.remove(token)
+            else:
+                loop.stop()
+                return
+            _report()
+
+    threading.Thread(target=_listen, daemon=True).start()
+    loop.run()
+    _report()
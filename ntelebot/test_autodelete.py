@@ -0,0 +1,115 @@
+"""Tests for ntelebot.autodelete."""
+
+import threading
+
+import ntelebot
+
+
+class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+    def __init__(self, token='1234:test'):
+        self.token = token
+        self.log = []
+
+    def delete_messages(self, chat_id, message_ids):
+        self.log.append((chat_id, message_ids))
+        return True
+
+
+def test_batching(monkeypatch, scheduler, executor):
+    """Verify deletions due in the same window are sent as one deleteMessages per chat."""
+
+    monkeypatch.setattr('time.time', lambda: 1001)
+    autodelete = ntelebot.autodelete.AutoDelete(scheduler=scheduler, executor=executor)
+    bot = MockBot()
+    autodelete.add(bot, 2000, 3, 60)
+    autodelete.add(bot, 2000, 1, 62)
+    autodelete.add(bot, 2001, 2, 60)
+    # 1061 and 1063 both round up to 1065.
+    assert [(when, args[1:]) for when, _, args in scheduler.calls] == [
+        (1065, ('1234', 2000, 1065)),
+        (1065, ('1234', 2001, 1065)),
+    ]
+
+    monkeypatch.setattr('time.time', lambda: 1065)
+    scheduler.run()
+    assert bot.log == [(2000, [1, 3]), (2001, [2])]
+    assert not autodelete.pending
+
+
+def test_max_ids(monkeypatch, scheduler, executor):
+    """Verify large batches are split into chunks of bulk_message_ids_max."""
+
+    monkeypatch.setattr('time.time', lambda: 0)
+    autodelete = ntelebot.autodelete.AutoDelete(scheduler=scheduler,
+                                                executor=executor,
+                                                granularity=0)
+    bot = MockBot()
+    for message_id in range(250):
+        autodelete.add(bot, 2000, message_id, 10)
+    assert len(scheduler.calls) == 1
+
+    monkeypatch.setattr('time.time', lambda: 10)
+    scheduler.run()
+    assert [(chat_id, len(message_ids)) for chat_id, message_ids in bot.log] == [
+        (2000, 100),
+        (2000, 100),
+        (2000, 50),
+    ]
+
+
+def test_persistence(monkeypatch, tmp_path, scheduler, executor):
+    """Verify pending deletions are logged by bot id, and restored from disk."""
+
+    path = str(tmp_path / 'autodelete.log')
+    monkeypatch.setattr('time.time', lambda: 0)
+    autodelete = ntelebot.autodelete.AutoDelete(path=path, scheduler=scheduler, executor=executor)
+    autodelete.add(MockBot(), 2000, 3000, 60)
+    autodelete.add(MockBot('5678:test'), 2000, 3000, 60)
+    autodelete.close()
+    with open(path, encoding='utf-8') as fobj:
+        lines = fobj.read().splitlines()
+    # Each deletion is appended to the log, which never contains tokens.
+    assert len(lines) == 2
+    assert ':test' not in ''.join(lines)
+    scheduler.calls.clear()
+
+    bot = MockBot()
+    autodelete = ntelebot.autodelete.AutoDelete(path=path,
+                                                scheduler=scheduler,
+                                                executor=executor,
+                                                resolve={'1234': bot}.get)
+    assert autodelete.pending == {('1234', 2000): {3000: 60}, ('5678', 2000): {3000: 60}}
+    assert [(when, args[1:]) for when, _, args in scheduler.calls] == [
+        (60, ('1234', 2000, 60)),
+        (60, ('5678', 2000, 60)),
+    ]
+
+    # Bots the resolver doesn't know are dropped.
+    monkeypatch.setattr('time.time', lambda: 60)
+    scheduler.run()
+    assert bot.log == [(2000, [3000])]
+    assert autodelete.bots == {'1234': bot}
+    autodelete.close()
+
+    autodelete = ntelebot.autodelete.AutoDelete(path=path, scheduler=scheduler, executor=executor)
+    assert not autodelete.pending
+    autodelete.close()
+
+
+def test_executor():
+    """Verify deletions are sent from the executor, not from the scheduler's thread."""
+
+    bot = MockBot()
+    sent = threading.Event()
+    threads = []
+
+    def _delete_messages(**unused_kwargs):
+        threads.append(threading.current_thread().name)
+        sent.set()
+
+    bot.delete_messages = _delete_messages
+    autodelete = ntelebot.autodelete.AutoDelete(granularity=0)
+    autodelete.add(bot, 2000, 3000, 0)
+    assert sent.wait(5)
+    assert threads[0].startswith('ntelebot.scheduler.executor')
@@ -0,0 +1,127 @@
+"""Tests for ntelebot.batcher."""
+
+import threading
+
+import pytest
+
+import ntelebot
+
+
+class MockBot:  # pylint: disable=missing-docstring
+
+    token = '1234:test'
+
+    def __init__(self):
+        self.log = []
+        self.fail_bulk = False
+
+    def delete_messages(self, chat_id, message_ids):
+        self.log.append(('delete_messages', chat_id, message_ids))
+        if self.fail_bulk:
+            raise ntelebot.errors.Error({'description': 'Bad Request: message to delete not found'})
+        return True
+
+    def delete_message(self, chat_id, message_id):
+        self.log.append(('delete_message', chat_id, message_id))
+        if message_id == 13:
+            raise ntelebot.errors.NotFound({})
+        return True
+
+    def forward_messages(self, chat_id, from_chat_id, message_ids, **kwargs):
+        self.log.append(('forward_messages', chat_id, from_chat_id, message_ids, kwargs))
+        return [{'message_id': 100 + message_id} for message_id in message_ids]
+
+    def copy_message(self, chat_id, from_chat_id, message_id, **kwargs):
+        self.log.append(('copy_message', chat_id, from_chat_id, message_id, kwargs))
+        return {'message_id': 200 + message_id}
+
+
+def test_delete(scheduler, executor):
+    """Verify deletes for the same chat are merged, and bulk failures fall back to single calls."""
+
+    bot = MockBot()
+    batcher = ntelebot.batcher.Batcher(bot, scheduler=scheduler, executor=executor)
+    futures = [batcher.delete_message(2000, message_id) for message_id in (12, 11, 12)]
+    other = batcher.delete_message(2001, 11)
+    assert not bot.log
+    scheduler.run()
+    assert bot.log == [('delete_messages', 2000, [11, 12]), ('delete_messages', 2001, [11])]
+    assert [future.result() for future in futures + [other]] == [True] * 4
+
+    bot.log.clear()
+    bot.fail_bulk = True
+    futures = [batcher.delete_message(2000, message_id) for message_id in (12, 13)]
+    scheduler.run()
+    assert bot.log == [
+        ('delete_messages', 2000, [12, 13]),
+        ('delete_message', 2000, 12),
+        ('delete_message', 2000, 13),
+    ]
+    assert futures[0].result() is True
+    with pytest.raises(ntelebot.errors.NotFound):
+        futures[1].result()
+
+
+def test_forward(scheduler, executor):
+    """Verify forwards are grouped by chat, source, and options, and results go to each caller."""
+
+    bot = MockBot()
+    batcher = ntelebot.batcher.Batcher(bot, scheduler=scheduler, executor=executor)
+    first = batcher.forward_message(2000, 3000, 2)
+    second = batcher.forward_message(2000, 3000, 1)
+    silent = batcher.forward_message(2000, 3000, 3, disable_notification=True)
+    again = batcher.forward_message(2000, 3000, 2)
+    scheduler.run()
+    assert bot.log == [
+        ('forward_messages', 2000, 3000, [1, 2], {}),
+        ('forward_messages', 2000, 3000, [3], {
+            'disable_notification': True
+        }),
+        ('forward_messages', 2000, 3000, [2], {}),
+    ]
+    assert first.result() == {'message_id': 102}
+    assert second.result() == {'message_id': 101}
+    assert silent.result() == {'message_id': 103}
+    assert again.result() == {'message_id': 102}
+
+
+def test_unbatchable(scheduler, executor):
+    """Verify calls using options the bulk methods don't support are sent right away."""
+
+    bot = MockBot()
+    batcher = ntelebot.batcher.Batcher(bot, scheduler=scheduler, executor=executor)
+    future = batcher.copy_message(2000, 3000, 1, caption='new caption')
+    assert bot.log == [('copy_message', 2000, 3000, 1, {'caption': 'new caption'})]
+    assert future.result() == {'message_id': 201}
+    assert not scheduler.calls
+
+
+def test_limit(scheduler, executor):
+    """Verify batches are capped at bulk_message_ids_max."""
+
+    bot = MockBot()
+    batcher = ntelebot.batcher.Batcher(bot, scheduler=scheduler, executor=executor)
+    for message_id in range(ntelebot.limits.bulk_message_ids_max + 1):
+        batcher.delete_message(2000, message_id)
+    scheduler.run()
+    assert [len(call[2]) for call in bot.log] == [ntelebot.limits.bulk_message_ids_max, 1]
+
+
+def test_executor():
+    """Verify batches are sent from the executor, not from the scheduler's thread."""
+
+    bot = MockBot()
+    threads = []
+    bot.delete_messages = lambda **kwargs: threads.append(threading.current_thread().name)
+    batcher = ntelebot.batcher.Batcher(bot, window=0)
+    assert batcher.delete_message(2000, 1).result(5) is True
+    assert threads[0].startswith('ntelebot.scheduler.executor')
+
+
+def test_bot_batched():
+    """Verify Bot.batched returns the bot's own Batcher."""
+
+    bot = ntelebot.bot.Bot('1234:test')
+    batched = bot.batched
+    assert batched.bot is bot
+    assert bot.batched is batched
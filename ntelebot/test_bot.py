@@ -114,6 +114,19 @@ Content-Length: 133
 Content-Type: application/json
 
 {"chat_id": 1234, "text": "my \\u2022 text", "entities": [{"type": "italic", "offset": 0, "length": 2}], "disable_notification": true}
+"""
+
+    # A FrozenKeyboard's pre-serialized JSON is spliced in as is.
+    assert prep({
+        'chat_id': 1234,
+        'reply_markup': ntelebot.keyboardutil.FrozenKeyboard([[{
+            'callback_data': 'data'
+        }]]),
+    }) == b"""
+Content-Type: application/json
+Content-Length: 85
+
+{"chat_id": 1234, "reply_markup": {"inline_keyboard": [[{"callback_data": "data"}]]}}
 """
 
     monkeypatch.setattr('urllib3.filepost.choose_boundary', lambda: 'BoUnDaRy')
@@ -159,3 +172,67 @@ Content-Disposition: form-data; name="file0"; filename=""
 CoNtEnTs
 --BoUnDaRy--
 """
+
+
+def test_username():
+    """Verify a known username skips get_me, and unknown ones are only looked up when needed."""
+
+    bot = ntelebot.bot.Bot('1234:known', username='knownbot')
+    assert bot.username == 'knownbot'
+
+    bot = ntelebot.bot.Bot('1234:test')
+    bot.get_me.respond(json={'ok': True, 'result': {'username': 'testbot'}})
+    assert bot.get_me.url == 'https://api.telegram.org/bot1234:test/getme'
+    assert bot.username == 'testbot'
+
+
+def test_resolve_usernames(requests_mock):
+    """Verify resolve_usernames looks up every unknown username, skipping failures."""
+
+    bots = [ntelebot.bot.Bot(f'{i}:test') for i in range(10)]
+    for bot in bots:
+        if bot.token == '3:test':
+            bot.get_me.respond(json={'ok': False, 'error_code': 401, 'description': 'Unauthorized'})
+        else:
+            bot.get_me.respond(json={'ok': True, 'result': {'username': f'bot{bot.token[0]}'}})
+    bots.append(ntelebot.bot.Bot('10:test', username='bot10'))
+
+    usernames = ntelebot.bot.resolve_usernames(bots)
+    assert requests_mock.call_count == 10
+    assert usernames == {bot.token: f'bot{bot.token[:-5]}' for bot in bots if bot.token != '3:test'}
+    assert bots[0].username == 'bot0'
+
+
+def test_cache(requests_mock):
+    """Verify Bot(cache=True) reuses results of read-only methods until invalidated."""
+
+    bot = ntelebot.bot.Bot('1234:test', cache=True)
+    # pylint: disable=no-member
+    bot.get_chat_member.request.respond(json={'ok': True, 'result': {'status': 'member'}})
+    bot.get_chat.request.respond(json={'ok': True, 'result': {'id': -1000}})
+    bot.send_message.respond(json={'ok': True, 'result': {}})
+
+    member = bot.get_chat_member(chat_id=-1000, user_id=1)
+    assert member == {'status': 'member'}
+    member['status'] = 'modified by the caller'
+    assert bot.get_chat_member(chat_id=-1000, user_id=1) == {'status': 'member'}
+    bot.get_chat_member(chat_id=-1000, user_id=2)
+    bot.get_chat(chat_id=-1000)
+    bot.get_chat(chat_id=-1000)
+    bot.send_message(chat_id=-1000, text='not cached')
+    bot.send_message(chat_id=-1000, text='not cached')
+    assert requests_mock.call_count == 5
+
+    bot.invalidate(-1000, 1)
+    bot.get_chat_member(chat_id=-1000, user_id=1)
+    bot.get_chat_member(chat_id=-1000, user_id=2)
+    bot.get_chat(chat_id=-1000)
+    assert requests_mock.call_count == 7
+
+    bot.invalidate(-1000)
+    bot.get_chat_member(chat_id=-1000, user_id=2)
+    assert requests_mock.call_count == 8
+
+    bot = ntelebot.bot.Bot('1234:test', cache={'get_chat': 60})
+    assert isinstance(bot.get_chat, ntelebot.bot._CachedRequest)  # pylint: disable=protected-access
+    assert isinstance(bot.get_chat_member, ntelebot.bot._Request)  # pylint: disable=protected-access
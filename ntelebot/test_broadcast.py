@@ -0,0 +1,80 @@
+"""Tests for ntelebot.broadcast."""
+
+import threading
+
+import ntelebot
+
+
+class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+    def __init__(self):
+        self.sent = []
+        self.throttled = False
+        self.outage = True
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text):
+        with self.lock:
+            if chat_id == 5 and not self.throttled:
+                self.throttled = True
+                raise ntelebot.errors.TooManyRequests({'parameters': {'retry_after': .05}})
+            if chat_id % 10 == 3:
+                raise ntelebot.errors.Forbidden({})
+            if chat_id == 7:
+                raise ntelebot.errors.Error({'description': 'Bad Request: chat not found'})
+            if chat_id == 9 and self.outage:
+                raise ntelebot.errors.Timeout()
+            self.sent.append((chat_id, text))
+
+
+def test_broadcast(tmp_path):
+    """Verify every chat gets one attempt, with outcomes recorded and Forbidden chats remembered.
+
+    A re-run skips chats already sent to or Forbidden, and tries the rest again.
+    """
+
+    path = str(tmp_path / 'broadcast.log')
+    forbidden_path = str(tmp_path / 'forbidden.log')
+    bot = MockBot()
+    broadcast = ntelebot.broadcast.Broadcast(bot,
+                                             path=path,
+                                             forbidden_path=forbidden_path,
+                                             rate=1000,
+                                             retries=0)
+    results = broadcast.run(range(20), text='hello')
+    assert sorted(chat_id for chat_id, _ in bot.sent) == [
+        i for i in range(20) if i % 10 != 3 and i not in (7, 9)
+    ]
+    assert results[0] == results[5] == 'sent'
+    assert results[3] == results[13] == 'forbidden'
+    assert results[7] == 'Error'
+    assert results[9] == 'Timeout'
+    assert broadcast.forbidden == {3, 13}
+
+    # A new Broadcast with the same log picks up where the last one left off, retrying failures.
+    bot.sent.clear()
+    bot.outage = False
+    broadcast = ntelebot.broadcast.Broadcast(bot, path=path, forbidden_path=forbidden_path)
+    assert broadcast.run(range(25), text='hello') == results | {
+        9: 'sent',
+        20: 'sent',
+        21: 'sent',
+        22: 'sent',
+        23: 'forbidden',
+        24: 'sent',
+    }
+    assert sorted(bot.sent) == [(9, 'hello'), (20, 'hello'), (21, 'hello'), (22, 'hello'),
+                                (24, 'hello')]
+
+    # A different announcement starts a fresh log, but still skips chats known to be Forbidden (even
+    # if the forbidden log was cut off mid-write).
+    bot.sent.clear()
+    with open(forbidden_path, 'a', encoding='utf-8') as fobj:
+        fobj.write('[99, "forb')
+    results = ntelebot.bot.Bot.broadcast(bot, [3, 4, 13, 23, 33],
+                                         forbidden_path=forbidden_path,
+                                         text='again')
+    assert results == {4: 'sent', 33: 'forbidden'}
+    assert bot.sent == [(4, 'again')]
+    assert ntelebot.broadcast.Broadcast(bot,
+                                        forbidden_path=forbidden_path).forbidden == {3, 13, 23, 33}
@@ -0,0 +1,114 @@
+"""Tests for ntelebot.cache."""
+
+import threading
+import time
+
+import pytest
+
+import ntelebot
+
+
+def test_ttl(monkeypatch):
+    """Verify entries expire after their TTL."""
+
+    now = 1000
+    monkeypatch.setattr('time.monotonic', lambda: now)
+
+    cache = ntelebot.cache.TTLCache(10)
+    cache['a'] = 1
+    cache.set('b', 2, ttl=20)
+    assert 'a' in cache
+    assert cache['a'] == 1
+    assert cache.get('b') == 2
+    assert len(cache) == 2
+
+    now = 1010
+    assert 'a' not in cache
+    assert cache.get('a', 'default') == 'default'
+    with pytest.raises(KeyError):
+        _ = cache['a']
+    assert cache.pop('b') == 2
+    assert cache.pop('b') is None
+    assert len(cache) == 0
+
+
+def test_maxsize():
+    """Verify the least recently used entries are evicted once the cache is full."""
+
+    cache = ntelebot.cache.TTLCache(60, maxsize=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache['a'] == 1
+    cache['c'] = 3
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_purge(monkeypatch):
+    """Verify expired entries are dropped without being read again."""
+
+    now = 1000
+    monkeypatch.setattr('time.monotonic', lambda: now)
+
+    cache = ntelebot.cache.TTLCache(10)
+    for i in range(100):
+        cache[i] = i
+    now = 1010
+    cache['new'] = 'value'
+    assert len(cache._data) == 1  # pylint: disable=protected-access
+    now = 1020
+    assert cache.get('missing') is None
+    assert not cache._data  # pylint: disable=protected-access
+
+
+def test_read_through():
+    """Verify concurrent misses share one fetch, failures aren't cached, and evict works."""
+
+    cache = ntelebot.cache.ReadThroughCache(10)
+    calls = []
+    release = threading.Event()
+
+    def _fetch():
+        calls.append(None)
+        release.wait(5)
+        return len(calls)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get('key', _fetch))) for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [1] * 5
+    assert cache.get('key', _fetch) == 1
+    assert len(calls) == 1
+
+    cache.evict(lambda key: key == 'key')
+    assert cache.get('key', _fetch) == 2
+
+    def _fail():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        cache.get('other', _fail)
+    assert cache.get('other', lambda: 'ok') == 'ok'
+
+
+def test_evict_while_fetching():
+    """Verify a value fetched across an evict isn't cached (as it may already be stale)."""
+
+    cache = ntelebot.cache.ReadThroughCache(10)
+
+    def _fetch():
+        cache.evict(lambda key: True)
+        return 'stale'
+
+    assert cache.get('key', _fetch) == 'stale'
+    assert cache.get('key', lambda: 'fresh') == 'fresh'
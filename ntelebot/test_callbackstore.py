@@ -0,0 +1,66 @@
+"""Tests for ntelebot.callbackstore."""
+
+import ntelebot
+
+
+def test_put_get(tmp_path):
+    """Verify entries are content-addressed, LRU-limited in memory, and persisted to SQLite."""
+
+    store = ntelebot.callbackstore.CallbackStore(maxsize=2)
+    first = store.put({'a': 1})
+    assert len(first) == 8
+    assert store.put({'a': 1}) == first
+    assert store.get(first) == {'a': 1}
+    second = store.put({'b': 2})
+    store.get(first)
+    store.put({'c': 3})
+    assert store.get(first) == {'a': 1}
+    assert store.get(second) is None
+    assert store.get('bogus') is None
+
+    path = str(tmp_path / 'callbacks.sqlite')
+    store = ntelebot.callbackstore.CallbackStore(path, maxsize=1)
+    first = store.put({'a': 1})
+    second = store.put({'b': 2})
+    assert store.get(first) == {'a': 1}
+    store = ntelebot.callbackstore.CallbackStore(path)
+    assert store.get(first) == {'a': 1}
+    assert store.get(second) == {'b': 2}
+
+
+def test_fix_combine():
+    """Verify fix/combine round trip callback_data and meta, and degrade without the entry."""
+
+    store = ntelebot.callbackstore.CallbackStore()
+    long_line = 'x' * 100
+    keyboard = [
+        [{'text': 'short', 'callback_data': 'short'}],
+        [{'text': 'long', 'callback_data': long_line}],
+        [{'text': 'url', 'url': 'https://example.com/'}],
+    ]  # yapf: disable
+
+    # Without meta, only over-long buttons are touched.
+    key = store.fix(keyboard, maxlen=64)
+    assert keyboard[0][0]['callback_data'] == 'short'
+    assert keyboard[1][0]['callback_data'] == f'\x02{key}\x020'
+    assert store.combine('short') == ('short', None)
+    assert store.combine(keyboard[1][0]['callback_data']) == (long_line, None)
+    assert store.fix([[{'callback_data': 'short'}]]) is None
+
+    keyboard = [
+        [{'callback_data': 'short'}],
+        [{'callback_data': long_line}],
+    ]  # yapf: disable
+    key = store.fix(keyboard, {'key': 'value'})
+    assert keyboard == [
+        [{'callback_data': f'\x01{key}\x01short'}],
+        [{'callback_data': f'\x02{key}\x020'}],
+    ]  # yapf: disable
+    assert store.combine(keyboard[0][0]['callback_data']) == ('short', {'key': 'value'})
+    assert store.combine(keyboard[1][0]['callback_data']) == (long_line, {'key': 'value'})
+    assert store.combine(f'\x02{key}\x029') == (f'\x02{key}\x029', None)
+
+    # Once the entry is gone, short callback_data still works (just without meta).
+    store.entries.clear()
+    assert store.combine(keyboard[0][0]['callback_data']) == ('short', None)
+    assert store.combine(keyboard[1][0]['callback_data']) == (keyboard[1][0]['callback_data'], None)
@@ -0,0 +1,37 @@
+"""Tests for ntelebot.checkpoint."""
+
+import pytest
+
+import ntelebot
+
+
+@pytest.mark.parametrize('cls',
+                         [ntelebot.checkpoint.FileCheckpoint, ntelebot.checkpoint.SqliteCheckpoint])
+def test_checkpoint(cls, tmp_path, scheduler):
+    """Verify acks are batched, persisted, and only ever move forward."""
+
+    path = str(tmp_path / 'offsets')
+    checkpoint = cls(path, interval=60, scheduler=scheduler)
+    assert checkpoint.get('1234:test') is None
+
+    # The first ack is written immediately.
+    checkpoint.ack('1234:test', 10)
+    assert cls(path).get('1234:test') == 10
+    assert not scheduler.calls
+
+    # Later acks within the interval are batched into a single scheduled flush.
+    checkpoint.ack('1234:test', 12)
+    checkpoint.ack('1234:test', 11)
+    checkpoint.ack('5678:test', 5)
+    assert checkpoint.get('1234:test') == 12
+    assert len(scheduler.calls) == 1
+    assert cls(path).get('1234:test') == 10
+
+    scheduler.calls[0][1]()
+    reloaded = cls(path)
+    assert reloaded.get('1234:test') == 12
+    assert reloaded.get('5678:test') == 5
+    # Offsets are stored by bot id, not token.
+    assert reloaded.offsets == {'1234': 12, '5678': 5}
+    with open(path, 'rb') as fobj:
+        assert b':test' not in fobj.read()
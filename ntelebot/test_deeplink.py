@@ -29,3 +29,30 @@ def test_decode():
 
     # b'\xff', triggering UnicodeDecodeError.
     assert ntelebot.deeplink.decode(b'/w') == ''
+
+
+def test_long():
+    """Verify long commands are compressed, or kept in a store, rather than silently broken."""
+
+    command = '/events ' + ' '.join(['weekly meetup downtown'] * 4)
+    assert len(command) * 4 / 3 > ntelebot.deeplink.MAX_LENGTH
+    encoded = ntelebot.deeplink.encode(command)
+    assert encoded.startswith('_')
+    assert len(encoded) <= ntelebot.deeplink.MAX_LENGTH
+    assert ntelebot.deeplink.decode(encoded) == command
+
+    command = '/events ' + ' '.join(str(i * 7919) for i in range(40))
+    store = ntelebot.callbackstore.CallbackStore()
+    encoded = ntelebot.deeplink.encode(command, store)
+    assert encoded.startswith('-')
+    assert len(encoded) <= ntelebot.deeplink.MAX_LENGTH
+    assert ntelebot.deeplink.decode(encoded, store) == command
+    assert ntelebot.deeplink.decode(encoded) == ''
+    assert ntelebot.deeplink.decode('-bogus', store) == ''
+
+    # Without a store, it is left over-long (and logged).
+    assert len(ntelebot.deeplink.encode(command)) > ntelebot.deeplink.MAX_LENGTH
+
+    # Malformed compressed values.
+    assert ntelebot.deeplink.decode('_') == ''
+    assert ntelebot.deeplink.decode('_AAAA') == ''
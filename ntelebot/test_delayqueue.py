@@ -1,5 +1,7 @@
 """Tests for ntelebot.delayqueue."""
 
+import asyncio
+import threading
 import time
 
 import ntelebot
@@ -47,3 +49,226 @@ def test_puthourly(monkeypatch):
     monkeypatch.setattr('time.time', lambda: 200)
     queue.puthourly(100, 2, jitter=300)
     assert queue.queue == [(3600 + 100 + 300, 200, 2)]
+
+
+def test_cancel():
+    """Verify cancelled items are never returned."""
+
+    queue = ntelebot.delayqueue.DelayQueue()
+    timer = queue.put(2)
+    queue.put(3)
+    assert timer.pending
+    assert timer.cancel()
+    assert not timer.pending
+    assert not timer.cancel()
+    assert queue.get() == 3
+    queue.task_done()
+    queue.join()
+
+    # Items can also be cancelled after they've been moved off the incoming queue.
+    now = time.time()
+    timer = queue.putwhen(now + .2, 4)
+    queue.putwhen(now + .3, 5)
+    queue.putwhen(now + .1, 3)
+    assert queue.get() == 3
+    assert timer.cancel()
+    assert queue.get() == 5
+
+    timer = queue.put(6)
+    assert queue.get() == 6
+    assert not timer.pending
+    assert not timer.cancel()
+
+
+def test_reschedule():
+    """Verify rescheduled items are returned at their new time."""
+
+    queue = ntelebot.delayqueue.DelayQueue()
+    now = time.time()
+    timer = queue.putwhen(now + 1000, 2)
+    queue.putwhen(now + .2, 3)
+    assert timer.when == now + 1000
+    assert timer.reschedule(now + .1)
+    assert timer.when == now + .1
+    assert queue.get() == 2
+    assert queue.get() == 3
+    assert not timer.reschedule(now)
+
+
+def test_compact(monkeypatch):
+    """Verify cancelled records are swept out once they outnumber live ones."""
+
+    monkeypatch.setattr(ntelebot.delayqueue.DelayQueue, 'COMPACT_MIN', 4)
+    queue = ntelebot.delayqueue.DelayQueue()
+    timers = [queue.putwhen(i, i) for i in range(10)]
+    for timer in timers[:5]:
+        timer.cancel()
+    assert len(queue.queue) == 10
+    timers[5].cancel()
+    assert sorted(record[2] for record in queue.queue) == [6, 7, 8, 9]
+    assert queue.unfinished_tasks == 4
+    assert [queue.get() for _ in range(4)] == [6, 7, 8, 9]
+
+
+def test_clocks():
+    """Verify wall-clock and monotonic records are kept in separate heaps, but returned in order."""
+
+    queue = ntelebot.delayqueue.DelayQueue()
+    now = time.time()
+    queue.putwhen(now + .2, 3)
+    queue.putafter(.1, 2)
+    queue.put(1)
+    assert queue.get() == 1
+    assert len(queue.heap) == len(queue.monotonic_heap) == 1
+    assert queue.get() == 2
+    assert queue.get() == 3
+    assert time.time() >= now + .2
+
+
+def test_putafter(monkeypatch):
+    """Verify relative delays are measured against the monotonic clock."""
+
+    queue = ntelebot.delayqueue.DelayQueue()
+    timer = queue.putafter(.2, 3)
+    queue.putafter(.1, 2)
+    assert timer.when > time.monotonic()
+
+    # Moving the wall clock forward doesn't make relative delays come due early.
+    now = time.time()
+    monkeypatch.setattr('time.time', lambda: now + 3600)
+    start = time.monotonic()
+    assert queue.get() == 2
+    assert queue.get() == 3
+    assert time.monotonic() - start >= .2
+
+    timer = queue.putafter(1000, 4)
+    assert timer.reschedule(time.monotonic())
+    assert queue.get() == 4
+
+
+def test_get_due():
+    """Verify get_due drains everything due at once."""
+
+    queue = ntelebot.delayqueue.DelayQueue()
+    now = time.time()
+    for i in range(5):
+        queue.putwhen(now - i, i)
+    queue.putwhen(now + 1000, 'later')
+    queue.putafter(0, 'relative')
+    assert sorted(queue.get_due(), key=str) == [0, 1, 2, 3, 4, 'relative']
+
+    for i in range(5):
+        queue.put(i)
+    assert queue.get_due(2) == [0, 1]
+    assert queue.get_due() == [2, 3, 4]
+
+
+def test_wakeup():
+    """Verify a waiting get() wakes for a newly added earlier item instead of its old deadline."""
+
+    queue = ntelebot.delayqueue.DelayQueue()
+    queue.putafter(1000, 'later')
+    threading.Timer(.1, queue.putafter, (.1, 'sooner')).start()
+    start = time.monotonic()
+    assert queue.get() == 'sooner'
+    assert .2 <= time.monotonic() - start < 1
+
+
+def test_persistent(tmp_path):
+    """Verify PersistentDelayQueue restores pending items from its log."""
+
+    path = str(tmp_path / 'queue.log')
+    with ntelebot.delayqueue.PersistentDelayQueue(path) as queue:
+        now = time.time()
+        queue.put({'job': 1})
+        queue.putwhen(now + 1000, {'job': 2})
+        timer = queue.putwhen(now + 2000, {'job': 3})
+        queue.putafter(3000, [4])
+        assert queue.get() == {'job': 1}
+        timer.cancel()
+
+    with ntelebot.delayqueue.PersistentDelayQueue(path) as queue:
+        assert sorted((round(record[0] - now, -1), record[2]) for record in queue.queue) == [
+            (1000, {
+                'job': 2
+            }),
+            (3000, [4]),
+        ]
+
+    # The log was compacted on open, and a partial line (from a crash mid-write) is ignored.
+    with open(path, encoding='utf-8') as fobj:
+        assert len(fobj.readlines()) == 2
+    with open(path, 'a', encoding='utf-8') as fobj:
+        fobj.write('[9,1,{"trunc')
+    with ntelebot.delayqueue.PersistentDelayQueue(path) as queue:
+        assert len(queue.queue) == 2
+        with open(path, encoding='utf-8') as fobj:
+            assert len(fobj.readlines()) == 2
+
+        timer = queue.putwhen(0, 'due')
+        assert queue.get() == 'due'
+        assert not timer.cancel()
+    with ntelebot.delayqueue.PersistentDelayQueue(path) as queue:
+        assert len(queue.queue) == 2
+    queue.close()
+
+
+def test_persistent_same_when(tmp_path):
+    """Verify restored items due at the same time are returned in order without comparing them."""
+
+    path = str(tmp_path / 'queue.log')
+    when = time.time() - 1
+    with ntelebot.delayqueue.PersistentDelayQueue(path) as queue:
+        for i in range(3):
+            queue.putwhen(when, {'job': i})
+
+    with ntelebot.delayqueue.PersistentDelayQueue(path) as queue:
+        queue.putwhen(when, {'job': 3})
+        assert queue.get_due() == [{'job': 0}, {'job': 1}, {'job': 2}, {'job': 3}]
+
+
+def test_persistent_compact(monkeypatch, tmp_path):
+    """Verify the log is rewritten once retired entries outnumber live ones."""
+
+    monkeypatch.setattr(ntelebot.delayqueue.DelayQueue, 'COMPACT_MIN', 4)
+    path = str(tmp_path / 'queue.log')
+    with ntelebot.delayqueue.PersistentDelayQueue(path) as queue:
+        queue.putwhen(time.time() + 1000, 'live')
+        for i in range(2):
+            queue.put(i)
+            assert queue.get() == i
+    with open(path, encoding='utf-8') as fobj:
+        assert len(fobj.readlines()) == 1
+
+
+def test_async():
+    """Verify AsyncDelayQueue orders, cancels, and reschedules items without threads."""
+
+    async def _test():
+        queue = ntelebot.delayqueue.AsyncDelayQueue()
+        now = time.time()
+        queue.put(1)
+        queue.putwhen(now + .2, 4)
+        queue.putafter(.1, 3)
+        timer = queue.putafter(.05, 'cancelled')
+        moved = queue.putafter(1000, 2)
+        assert abs(moved.when - (now + 1000)) < 1
+        assert moved.reschedule(now)
+        assert timer.cancel()
+        assert not timer.cancel()
+
+        assert await queue.get() == 1
+        assert await queue.get() == 2
+        assert not moved.pending
+        assert not moved.reschedule(now)
+        assert await queue.get_due() == [3]
+        assert await queue.get() == 4
+        assert time.time() >= now + .2
+
+        for i in range(5):
+            queue.putafter(0, i)
+        await asyncio.sleep(0)
+        assert await queue.get_due(3) == [0, 1, 2]
+        assert await queue.get_due() == [3, 4]
+
+    asyncio.run(_test())
@@ -126,6 +126,32 @@ def test_loop_dispatcher():
     assert dispatcher(bot, {'message': message}) is False
 
 
+def test_allowed_updates():
+    """Verify LoopDispatcher only asks for the update types its handlers could see."""
+
+    dispatcher = ntelebot.dispatch.LoopDispatcher()
+    assert dispatcher.ctx_types == set()
+    assert dispatcher.allowed_updates == ['my_chat_member']
+
+    subdispatcher = ntelebot.dispatch.Dispatcher()
+    dispatcher.add(subdispatcher)
+    subdispatcher.add_inline(None, lambda ctx: 'INLINE')
+    assert dispatcher.allowed_updates == ['inline_query', 'my_chat_member']
+
+    dispatcher.add_command('command', lambda ctx: 'COMMAND')
+    assert dispatcher.ctx_types == {'callback_query', 'inline_query', 'message'}
+    assert dispatcher.allowed_updates == [
+        'callback_query', 'channel_post', 'inline_query', 'message', 'my_chat_member'
+    ]
+
+    subdispatcher.add(lambda ctx: 'CATCHALL')
+    assert dispatcher.ctx_types is None
+    assert dispatcher.allowed_updates == list(ntelebot.preprocess.Preprocessor.UPDATE_TYPES)
+
+    dispatcher = ntelebot.dispatch.LoopDispatcher(preprocessor=lambda bot, update: None)
+    assert dispatcher.allowed_updates is None
+
+
 def test_dispatch_module():
     """Verify the magic in ntelebot.dispatch.get_callback."""
 
@@ -0,0 +1,107 @@
+"""Tests for ntelebot.editmanager."""
+
+import threading
+
+import pytest
+
+import ntelebot
+
+
+class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+    token = '1234:test'
+
+    def __init__(self):
+        self.log = []
+        self.error = None
+
+    def edit_message_text(self, **kwargs):
+        if self.error:
+            raise self.error
+        self.log.append(kwargs)
+        return {'message_id': kwargs['message_id'], 'text': kwargs['text']}
+
+
+def test_coalesce(monkeypatch, scheduler, executor):
+    """Verify bursts of edits only send the first and the last."""
+
+    now = 1000
+    monkeypatch.setattr('time.monotonic', lambda: now)
+    edits = ntelebot.editmanager.EditManager(window=1, scheduler=scheduler, executor=executor)
+    bot = MockBot()
+
+    assert edits.edit(bot, 2000, 3000, text='10%') == {'message_id': 3000, 'text': '10%'}
+    now = 1000.25
+    assert edits.edit(bot, 2000, 3000, text='20%') is None
+    now = 1000.5
+    assert edits.edit(bot, 2000, 3000, text='30%') is None
+    assert edits.edit(bot, 2000, 3001, text='other message') is not None
+    assert [kwargs['text'] for kwargs in bot.log] == ['10%', 'other message']
+    assert [delay for delay, _, _ in scheduler.calls] == [.75]
+
+    now = 1001
+    scheduler.run()
+    assert [kwargs['text'] for kwargs in bot.log] == ['10%', 'other message', '30%']
+    assert not edits.pending
+
+    # An edit made after the window closes goes straight out.
+    now = 1003
+    assert edits.edit(bot, 2000, 3000, text='100%') is not None
+    assert len(bot.log) == 4
+
+
+def test_unmodified(monkeypatch, scheduler, executor):
+    """Verify edits identical to the last one sent never leave the process."""
+
+    now = 1000
+    monkeypatch.setattr('time.monotonic', lambda: now)
+    edits = ntelebot.editmanager.EditManager(window=1, scheduler=scheduler, executor=executor)
+    bot = MockBot()
+
+    edits.edit(bot, 2000, 3000, text='done', parse_mode='HTML')
+    now = 1005
+    assert edits.edit(bot, 2000, 3000, parse_mode='HTML', text='done') is None
+    assert len(bot.log) == 1
+    assert edits.edit(bot, 2000, 3000, text='done') is not None
+    assert len(bot.log) == 2
+
+    # A burst that ends up back where it started sends nothing more.
+    now = 1005.5
+    edits.edit(bot, 2000, 3000, text='changed')
+    edits.edit(bot, 2000, 3000, text='done')
+    scheduler.run()
+    assert len(bot.log) == 2
+
+    # Telegram's own "message is not modified" is swallowed.
+    now = 1010
+    bot.error = ntelebot.errors.Unmodified({'description': 'Bad Request: message is not modified'})
+    assert edits.edit(bot, 2000, 3000, text='changed elsewhere') is None
+
+    # Other failures propagate, and don't suppress an identical retry.
+    now = 1020
+    bot.error = ntelebot.errors.Forbidden({})
+    with pytest.raises(ntelebot.errors.Forbidden):
+        edits.edit(bot, 2000, 3000, text='retry me')
+    bot.error = None
+    now = 1030
+    assert edits.edit(bot, 2000, 3000, text='retry me') is not None
+
+
+def test_executor():
+    """Verify held-back edits are sent from the executor, not from the scheduler's thread."""
+
+    bot = MockBot()
+    sent = threading.Event()
+    threads = []
+
+    def _edit_message_text(**unused_kwargs):
+        threads.append(threading.current_thread().name)
+        sent.set()
+
+    bot.edit_message_text = _edit_message_text
+    edits = ntelebot.editmanager.EditManager(window=.01)
+    edits.edit(bot, 2000, 3000, text='first')
+    sent.clear()
+    edits.edit(bot, 2000, 3000, text='second')
+    assert sent.wait(5)
+    assert threads[1].startswith('ntelebot.scheduler.executor')
@@ -0,0 +1,197 @@
+"""Tests for ntelebot.fakeserver."""
+
+import io
+import threading
+import time
+
+import pytest
+
+import ntelebot
+
+
+def _bot(fake_server, token='1234:fake', **kwargs):
+    return ntelebot.bot.Bot(token, base_url=fake_server.base_url, **kwargs)
+
+
+def test_messages(fake_server):
+    """Verify getMe, sendMessage, editMessageText, and deleteMessage."""
+
+    bot = _bot(fake_server)
+    assert bot.get_me()['username'] == 'fake1234bot'
+    assert bot.username == 'fake1234bot'
+
+    message = bot.send_message(chat_id=1000, text='first')
+    assert message['message_id'] == 1
+    assert message['chat'] == {'id': 1000, 'type': 'private'}
+    assert message['text'] == 'first'
+    assert bot.send_message(chat_id=1000, text='second')['message_id'] == 2
+    assert bot.send_message(chat_id=-1000, text='group')['message_id'] == 1
+
+    assert bot.edit_message_text(chat_id=1000, message_id=1, text='edited')['text'] == 'edited'
+    with pytest.raises(ntelebot.errors.Unmodified):
+        bot.edit_message_text(chat_id=1000, message_id=1, text='edited')
+    with pytest.raises(ntelebot.errors.Error):
+        bot.edit_message_text(chat_id=1000, message_id=99, text='edited')
+    with pytest.raises(ntelebot.errors.TooLong):
+        bot.send_message(chat_id=1000, text='x' * 5000)
+
+    assert bot.delete_message(chat_id=1000, message_id=1) is True
+    with pytest.raises(ntelebot.errors.Error):
+        bot.delete_message(chat_id=1000, message_id=1)
+    with pytest.raises(ntelebot.errors.NotFound):
+        bot.get_dummy()
+
+    assert fake_server.requests['sendmessage'] == 4
+
+
+def test_files(fake_server):
+    """Verify uploads, file_id reuse, getFile, and downloads."""
+
+    bot = _bot(fake_server)
+    message = bot.send_photo(chat_id=1000, photo=io.BytesIO(b'CoNtEnTs'), caption='123')
+    assert message['caption'] == '123'
+    file_id = message['photo'][0]['file_id']
+    assert bot.send_photo(chat_id=1000, photo=file_id)['photo'][0]['file_id'] == file_id
+    document = bot.send_document(chat_id=1000, document=io.BytesIO(b'doc'))['document']
+    assert document['file_size'] == 3
+
+    path = bot.get_file(file_id=file_id)['file_path']
+    response = ntelebot.requests.get(f'{fake_server.file_url}{bot.token}/{path}', timeout=5)
+    assert response.content == b'CoNtEnTs'
+    with pytest.raises(ntelebot.errors.Error):
+        bot.get_file(file_id='bogus')
+
+
+def test_updates(fake_server):
+    """Verify pushed and fed updates, offsets, limits, allowed_updates, and long polling."""
+
+    bot = _bot(fake_server)
+    assert not bot.get_updates(timeout=0)
+
+    fake_server.push(bot.token, {'message': {'text': 'one'}}, {'inline_query': {'query': 'two'}})
+    updates = bot.get_updates()
+    assert [update['update_id'] for update in updates] == [1, 2]
+    assert [update['update_id'] for update in bot.get_updates(offset=2)] == [2]
+    assert not bot.get_updates(offset=2, allowed_updates=['message'])
+    assert not bot.get_updates(offset=3)
+
+    # Updates of types that weren't asked for are discarded, not left blocking the ones that were.
+    edited, message = {'edited_message': {'text': 'skipped'}}, {'message': {'text': 'kept'}}
+    fake_server.push(bot.token, edited, message)
+    updates = bot.get_updates(offset=3, allowed_updates=['message'], limit=1, timeout=0)
+    assert [update['update_id'] for update in updates] == [4]
+    assert [update['update_id'] for update in bot.get_updates(offset=3)] == [4]
+
+    fake_server.feed(bot.token, ({'message': {'text': str(i)}} for i in range(250)))
+    updates = bot.get_updates(offset=5, limit=100)
+    assert len(updates) == 100
+    assert updates[0]['message']['text'] == '0'
+    updates = bot.get_updates(offset=updates[-1]['update_id'] + 1, limit=200)
+    assert len(updates) == 100
+    assert updates[0]['message']['text'] == '100'
+
+    # A long poll returns as soon as an update arrives.
+    offset = updates[-1]['update_id'] + 1
+    bot.get_updates(offset=offset)
+    fake_server.feed(bot.token, ())
+    bot.get_updates(offset=offset + 50)
+    threading.Timer(.2, fake_server.push, (bot.token, {'message': {'text': 'late'}})).start()
+    start = time.monotonic()
+    updates = bot.get_updates(offset=offset + 50, timeout=5)
+    assert time.monotonic() - start < 2
+    assert updates[0]['message']['text'] == 'late'
+
+
+def test_conflict(fake_server):
+    """Verify an overlapping getUpdates ends the earlier one with 409 Conflict."""
+
+    bot = _bot(fake_server)
+    errors = []
+
+    def _poll():
+        try:
+            _bot(fake_server).get_updates(timeout=5)
+        except ntelebot.errors.Conflict as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=_poll)
+    thread.start()
+    time.sleep(.2)
+    assert not bot.get_updates(timeout=0)
+    thread.join(5)
+    assert len(errors) == 1
+
+
+def test_errors(fake_server):
+    """Verify scripted and random error injection, and latency."""
+
+    bot = _bot(fake_server)
+    fake_server.fail(429, 'send_message', count=2, retry_after=3)
+    for _ in range(2):
+        with pytest.raises(ntelebot.errors.TooManyRequests) as excinfo:
+            bot.send_message(chat_id=1000, text='text')
+        assert excinfo.value.retry_after == 3
+    assert bot.get_me()
+    fake_server.fail(502)
+    with pytest.raises(ntelebot.errors.BadGateway):
+        bot.get_me()
+    assert bot.send_message(chat_id=1000, text='text')
+
+    fake_server.error_rates = {409: 1}
+    with pytest.raises(ntelebot.errors.Conflict):
+        bot.get_updates()
+    fake_server.error_rates = {}
+
+    fake_server.latency = .2
+    start = time.monotonic()
+    bot.get_me()
+    assert time.monotonic() - start >= .2
+
+
+def test_flood_limits(fake_server):
+    """Verify flood-limit emulation throttles sends per chat and per bot."""
+
+    fake_server.flood_limits = True
+    bot = _bot(fake_server)
+    assert bot.send_message(chat_id=1000, text='text')
+    with pytest.raises(ntelebot.errors.TooManyRequests) as excinfo:
+        bot.send_message(chat_id=1000, text='text')
+    assert excinfo.value.retry_after == 1
+
+    for chat_id in range(2000, 2000 + ntelebot.limits.messages_per_second_max - 1):
+        assert bot.send_message(chat_id=chat_id, text='text')
+    with pytest.raises(ntelebot.errors.TooManyRequests):
+        bot.send_message(chat_id=3000, text='text')
+
+    # Other bots have their own limits.
+    assert _bot(fake_server, '5678:fake').send_message(chat_id=1000, text='text')
+
+
+def test_loop(fake_server):
+    """Verify Loop, LoopDispatcher, and Context run end to end against the fake_server."""
+
+    bot = _bot(fake_server, timeout=3)
+    dispatcher = ntelebot.dispatch.LoopDispatcher()
+    dispatcher.add_command('echo', lambda ctx: ctx.reply_text(ctx.text))
+    chat = {'id': 1000, 'type': 'private'}
+    user = {'id': 1000}
+    fake_server.feed(bot.token, ({
+        'message': {
+            'message_id': i,
+            'chat': chat,
+            'from': user,
+            'text': f'/echo {i}',
+        },
+    } for i in range(1, 51)))
+
+    loop = ntelebot.loop.Loop()
+    loop.add(bot, dispatcher)
+    thread = threading.Thread(target=loop.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while fake_server.requests['sendmessage'] < 50 and time.monotonic() < deadline:
+        time.sleep(.05)
+    loop.stop()
+    thread.join(5)
+    assert fake_server.requests['sendmessage'] == 50
+    assert fake_server.bots[bot.token].messages[(1000, 50)]['text'] == '50'
@@ -2,6 +2,7 @@
 
 import base64
 import json
+import re
 
 import ntelebot
 
@@ -41,3 +42,55 @@ def test_decode():
     }).encode('ascii')) == b'eyJhYSI6ICJiYiJ9'
     entities[-1]['url'] = 'tg://meta/eyJhYSI6ICJiYiJ9'
     assert ntelebot.invislink.decode(entities) == (None, {'aa': 'bb'})
+
+
+def _entities(html):
+    return [{'type': 'text_link', 'url': url} for url in re.findall('href="([^"]*)"', html)]
+
+
+def test_compact():
+    """Verify encode's compact format round trips through decode, and is smaller than before."""
+
+    # pylint: disable=protected-access
+
+    btn = ['/events 1234 -1001234567890 ', '/events 1234 -1009876543210 ']
+    meta = {
+        'chat': -1001234567890,
+        'page': 3,
+        'ratio': .5,
+        'query': 'café •',
+        'ids': [1, 22, 333],
+        'seen': True,
+        'next': None,
+    }
+    html = ntelebot.invislink.encode(btn, meta)
+    entities = _entities(html)
+    # Short values don't compress, so are left in the legacy format.
+    assert entities == _entities(f'<a href="tg://btn/{ntelebot.invislink._encode_list(btn)}">'
+                                 f'<a href="tg://meta/{ntelebot.invislink._encode_json(meta)}">')
+    assert ntelebot.invislink.decode(entities) == (btn, meta)
+    compact = _entities(f'<a href="tg://meta/{ntelebot.invislink._encode_compact(meta)}">')
+    assert compact[0]['url'].startswith('tg://meta/~')
+    assert ntelebot.invislink.decode(compact) == (None, meta)
+
+    btn = [f'/events 1234 -100{i:010} ' for i in range(32)]
+    url = _entities(ntelebot.invislink.encode(btn, None))[0]['url']
+    assert url.startswith('tg://btn/~')
+    assert len(url) < len(ntelebot.invislink._encode_list(btn)) / 2
+    assert ntelebot.invislink.decode([{'type': 'text_link', 'url': url}]) == (btn, None)
+
+    # Repetitive payloads are compressed.
+    meta = {'text': 'abc' * 100}
+    url = _entities(ntelebot.invislink.encode(None, meta))[0]['url']
+    assert len(url) < 100
+    assert ntelebot.invislink.decode([{'type': 'text_link', 'url': url}]) == (None, meta)
+
+    # Meta the compact format can't represent falls back to JSON.
+    url = _entities(ntelebot.invislink.encode(None, {1: 'one'}))[0]['url']
+    assert not url.startswith('tg://meta/~')
+    assert ntelebot.invislink.decode([{'type': 'text_link', 'url': url}]) == (None, {'1': 'one'})
+
+    # Malformed.
+    for url in ('tg://btn/~', 'tg://btn/~AQA', 'tg://btn/~AwA', 'tg://meta/~AQUFYQ',
+                'tg://meta/~AQcBAWEH', 'tg://meta/~AQA', 'tg://meta/~Ag'):
+        assert ntelebot.invislink.decode([{'type': 'text_link', 'url': url}]) == (None, None)
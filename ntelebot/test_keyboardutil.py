@@ -1,5 +1,7 @@
 """Tests for ntelebot.keyboardutil."""
 
+import json
+
 import ntelebot
 
 
@@ -30,6 +32,11 @@ def test_shorten_lines():
     assert ntelebot.keyboardutil.shorten_lines(['long line', 'longer line'], 5) == (
         ['longer li', 'long li'],
         {'long line': '\x001\x00ne', 'longer line': '\x000\x00ne'})  # yapf: disable
+    # 'abcdefg' could use either prefix, and gets the longer one (for the shorter callback_data).
+    assert ntelebot.keyboardutil.shorten_lines(['abcdefgh', 'abcdeZZ', 'abcdefg'], 5) == (
+        ['abcdef', 'abcde'],
+        {'abcdefgh': '\x000\x00gh', 'abcdeZZ': '\x001\x00ZZ',
+         'abcdefg': '\x000\x00g'})  # yapf: disable
 
 
 def test_fix():
@@ -56,3 +63,28 @@ def test_fix():
         [{'callback_data': '\x001\x00nk'}],
         [{'callback_data': '\x000\x00ne'}],
     ]  # yapf: disable
+
+
+def test_frozen_keyboard():
+    """Verify FrozenKeyboard encodes a copy of its keyboard once, up front."""
+
+    keyboard = [
+        [{'callback_data': 'short'}],
+        [{'callback_data': 'long line'}],
+    ]  # yapf: disable
+    frozen = ntelebot.keyboardutil.FrozenKeyboard(keyboard, 5)
+    assert keyboard == [
+        [{'callback_data': 'short'}],
+        [{'callback_data': 'long line'}],
+    ]  # yapf: disable
+    assert frozen == {'inline_keyboard': [
+        [{'callback_data': 'short'}],
+        [{'callback_data': '\x000\x00ne'}],
+    ]}  # yapf: disable
+    assert frozen.prefixes == ['long li']
+    assert frozen.btn_link == ntelebot.invislink.encode(['long li'], None)
+    assert json.loads(frozen.json) == frozen
+
+    frozen = ntelebot.keyboardutil.FrozenKeyboard(keyboard)
+    assert frozen.prefixes is None
+    assert frozen.btn_link == ''
@@ -1,5 +1,6 @@
 """Tests for ntelebot.loop."""
 
+import socket
 import threading
 import time
 
@@ -84,3 +85,254 @@ def test_remove():
     threading.Timer(.15, _shutdown).start()
     loop.run()
     assert received == updates[:1]
+
+
+def test_checkpoint(tmp_path):
+    """Verify a Loop with a checkpoint resumes from the last update actually dispatched."""
+
+    updates = [
+        {'update_id': 100, 'message': {'text': 'first'}},
+        {'update_id': 101, 'message': {'text': 'second'}},
+    ]  # yapf: disable
+    offsets = []
+
+    class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+        timeout = 3
+        token = 'mock:bot'
+        username = 'mockbot'
+
+        @staticmethod
+        def get_updates(offset=None, timeout=None):
+            _ = timeout
+            offsets.append((offset, len(received)))
+            if offset is None:
+                return updates
+            time.sleep(.05)
+            return []
+
+    received = []
+
+    def _dispatch(unused_bot, update):
+        time.sleep(.05)
+        received.append(update)
+
+    path = str(tmp_path / 'offsets.json')
+    loop = ntelebot.loop.Loop(checkpoint=ntelebot.checkpoint.FileCheckpoint(path))
+    loop.add(MockBot(), _dispatch)
+    threading.Timer(.3, loop.stop).start()
+    loop.run()
+    assert received == updates
+    # The second poll (acknowledging both updates to Telegram) waited for both to be dispatched.
+    assert offsets[:2] == [(None, 0), (102, 2)]
+
+    offsets.clear()
+    received.clear()
+    loop = ntelebot.loop.Loop(checkpoint=ntelebot.checkpoint.FileCheckpoint(path))
+    loop.add(MockBot(), _dispatch)
+    threading.Timer(.1, loop.stop).start()
+    loop.run()
+    assert offsets[0] == (102, 0)
+
+
+def test_high_water():
+    """Verify pollers stop pulling updates while the dispatch backlog is at the high-water mark."""
+
+    limits = []
+    backlogs = []
+
+    class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+        timeout = 3
+        token = 'mock:bot'
+        username = 'mockbot'
+        next_id = 0
+
+        def get_updates(self, offset=None, timeout=None, limit=None):
+            _ = offset, timeout
+            limits.append(limit)
+            updates = [{'update_id': self.next_id + i} for i in range(limit)]
+            self.next_id += limit
+            return updates
+
+    def _dispatch(unused_bot, unused_update):
+        backlogs.append(loop.backlog)
+        time.sleep(.01)
+
+    loop = ntelebot.loop.Loop(high_water=5)
+    # Timers scheduled by the application don't count against the high-water mark.
+    for _ in range(10):
+        loop.queue.putwhen(time.time() + 1000, lambda: None)
+    loop.add(MockBot(), _dispatch)
+    threading.Timer(.3, loop.stop).start()
+    loop.run()
+    assert limits[0] == 5
+    assert 1 <= min(limits) and max(limits) <= 5
+    assert len(backlogs) > 10
+    assert max(backlogs) <= 5
+
+
+def test_shed():
+    """Verify inline and callback queries are shed once they have waited past their max age."""
+
+    updates = [
+        {'update_id': 0, 'message': {'text': 'slow'}},
+        {'update_id': 1, 'inline_query': {'id': 'iq'}},
+        {'update_id': 2, 'callback_query': {'id': 'cq'}},
+        {'update_id': 3, 'message': {'text': 'late but still wanted'}},
+    ]  # yapf: disable
+    answered = []
+
+    class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+        timeout = 3
+        token = 'mock:bot'
+        username = 'mockbot'
+
+        @staticmethod
+        def get_updates(offset=None, timeout=None):
+            _ = timeout
+            if offset is None:
+                return updates
+            time.sleep(.05)
+            return []
+
+        @staticmethod
+        def answer_callback_query(callback_query_id):
+            answered.append(callback_query_id)
+
+    received = []
+
+    def _dispatch(unused_bot, update):
+        time.sleep(.1)
+        received.append(update)
+
+    loop = ntelebot.loop.Loop(max_ages={'callback_query': .05, 'inline_query': .05}, priorities={})
+    loop.add(MockBot(), _dispatch)
+    threading.Timer(.3, loop.stop).start()
+    loop.run()
+    assert received == [updates[0], updates[3]]
+    assert answered == ['cq']
+    assert loop.shed == {'callback_query': 1, 'inline_query': 1}
+
+
+def test_priorities():
+    """Verify interactive updates jump ahead of earlier ones, unless their bot opts out."""
+
+    updates = [
+        {'update_id': 0, 'message': {'text': 'first'}},
+        {'update_id': 1, 'message': {'text': 'second'}},
+        {'update_id': 2, 'callback_query': {'id': 'cq'}},
+    ]  # yapf: disable
+
+    class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+        timeout = 3
+        username = 'mockbot'
+
+        def __init__(self, token, cache=None):
+            self.token = token
+            self.cache = cache
+
+        @staticmethod
+        def get_updates(offset=None, timeout=None):
+            _ = timeout
+            if offset is None:
+                return updates
+            time.sleep(.05)
+            return []
+
+    received = []
+
+    def _dispatch(bot, update):
+        received.append((bot.token, update['update_id']))
+
+    loop = ntelebot.loop.Loop()
+    loop.add(MockBot('mock:boosted'), _dispatch)
+    loop.add(MockBot('mock:fifo'), _dispatch, priorities={})
+    threading.Timer(.1, loop.stop).start()
+    loop.run()
+    assert [i for token, i in received if token == 'mock:boosted'] == [2, 0, 1]
+    assert [i for token, i in received if token == 'mock:fifo'] == [0, 1, 2]
+
+
+def test_allowed_updates():
+    """Verify the dispatcher's (or an explicit) allowed_updates is passed to Bot.get_updates."""
+
+    requested = {}
+
+    class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+        timeout = 3
+        username = 'mockbot'
+
+        def __init__(self, token, cache=None):
+            self.token = token
+            self.cache = cache
+
+        def get_updates(self, offset=None, timeout=None, allowed_updates=None):
+            _ = offset, timeout
+            requested[self.token] = allowed_updates
+            time.sleep(.05)
+            return []
+
+    dispatcher = ntelebot.dispatch.LoopDispatcher()
+    dispatcher.add_inline(None, lambda ctx: None)
+    loop = ntelebot.loop.Loop()
+    loop.add(MockBot('mock:derived'), dispatcher)
+    loop.add(MockBot('mock:explicit'), dispatcher, allowed_updates=['message'])
+    loop.add(MockBot('mock:cached', cache=True), dispatcher)
+    threading.Timer(.1, loop.stop).start()
+    loop.run()
+    assert requested == {
+        'mock:cached': ['chat_member', 'inline_query', 'my_chat_member'],
+        'mock:derived': ['inline_query', 'my_chat_member'],
+        'mock:explicit': ['message'],
+    }
+
+
+def test_interrupt():
+    """Verify Loop.remove and Loop.stop abort in-flight polls, and re-adding can't double-poll."""
+
+    with socket.create_server(('127.0.0.1', 0)) as server:
+        bot = ntelebot.bot.Bot('1234:test', timeout=30)
+        bot._username = 'mockbot'  # pylint: disable=protected-access
+        bot.url = f'http://127.0.0.1:{server.getsockname()[1]}/bot{bot.token}/'
+        bot.get_updates.respond(real_http=True)
+
+        loop = ntelebot.loop.Loop()
+        loop.add(bot, lambda bot, update: None)
+        first = loop.pollers[bot.token]
+        time.sleep(.1)
+        start = time.monotonic()
+        loop.remove(bot.token)
+        loop.add(bot, lambda bot, update: None)
+        loop.add(bot, lambda bot, update: None)
+        second = loop.pollers[bot.token]
+        assert second is not first
+        first.thread.join(1)
+        assert not first.thread.is_alive()
+        assert time.monotonic() - start < 1
+
+        time.sleep(.1)
+        start = time.monotonic()
+        threading.Timer(0, loop.stop).start()
+        loop.run()
+        second.thread.join(1)
+        assert not second.thread.is_alive()
+        assert time.monotonic() - start < 1
+        assert not loop._retiring  # pylint: disable=protected-access
+
+
+def test_lazy_username(requests_mock):
+    """Verify adding a bot doesn't look up its username just to name the polling thread."""
+
+    bot = ntelebot.bot.Bot('1234:test')
+    bot.get_updates.respond(json={'ok': True, 'result': []})
+    loop = ntelebot.loop.Loop()
+    loop.add(bot, lambda bot, update: None)
+    assert loop.pollers[bot.token].thread.name == 'bot1234'
+    threading.Timer(.1, loop.stop).start()
+    loop.run()
+    assert {request.path for request in requests_mock.request_history
+           } == {'/bot1234:test/getupdates'}
@@ -1,5 +1,7 @@
 """Tests for ntelebot.preprocess."""
 
+import pytest
+
 import ntelebot
 
 
@@ -63,6 +65,63 @@ def test_callback_query():
     ctx.reply_text(response_text)
     assert bot.log == "edit_message_text(chat_id=2000, message_id=3000, text='response • message')"
 
+    # With an EditManager, repeating the same edit is dropped.
+    preprocessor = ntelebot.preprocess.Preprocessor(edits=ntelebot.editmanager.EditManager())
+    ctx = preprocessor(bot, {'callback_query': callback_query})
+    ctx.reply_text(response_text)
+    assert bot.log == "edit_message_text(chat_id=2000, message_id=3000, text='response • message')"
+    assert ctx.reply_text(response_text) is None
+    assert bot.log == ''
+
+    # A FrozenKeyboard's invisible link is the same as the one reply_text would have built.
+    keyboard = [[{'text': 'Next', 'callback_data': f'/test {"x" * 100}'}]]
+    ctx = preprocessor(bot, {'callback_query': callback_query})
+    ctx.meta['key'] = 'value'
+    ctx.reply_html('html', reply_markup={'inline_keyboard': keyboard})
+    expected = bot.log
+    ctx.reply_html('frozen', reply_markup=ntelebot.keyboardutil.FrozenKeyboard(keyboard))
+    assert bot.log == expected.replace('html', 'frozen')
+
+    # Without HTML, there'd be no invisible link to decode its callback_data with.
+    frozen = ntelebot.keyboardutil.FrozenKeyboard([[{'callback_data': f'/test {"x" * 100}'}]])
+    with pytest.raises(ValueError):
+        ctx.reply_text('frozen', reply_markup=frozen)
+    frozen = ntelebot.keyboardutil.FrozenKeyboard([[{'callback_data': '/test'}]])
+    ctx.reply_text('frozen', reply_markup=frozen)
+    assert 'tg://btn' not in bot.log
+
+
+def test_callback_query_store():
+    """Verify a CallbackStore carries callback_data and meta, falling back to invisible links."""
+
+    bot = MockBot()
+    store = ntelebot.callbackstore.CallbackStore()
+    preprocessor = ntelebot.preprocess.Preprocessor(store=store)
+
+    user = {'id': 1000}
+    chat = {'id': 2000}
+    message = {'message_id': 3000, 'chat': chat}
+    callback_query = {'id': 4000, 'from': user, 'message': message, 'data': '/test'}
+    ctx = preprocessor(bot, {'callback_query': callback_query})
+    ctx.meta['key'] = 'value'
+    long_data = f'/test {"x" * 100}'
+    keyboard = [[{'text': 'Next', 'callback_data': long_data}]]
+    ctx.reply_html('html', reply_markup={'inline_keyboard': keyboard})
+    # No invisible links are added.
+    assert "text='html'" in bot.log
+
+    ctx = preprocessor(
+        bot, {'callback_query': dict(callback_query, data=keyboard[0][0]['callback_data'])})
+    assert ctx.text == long_data[len('/test '):]
+    assert ctx.meta == {'key': 'value'}
+
+    # Messages sent before the store was in use are still decoded from their invisible links.
+    entities = [{'type': 'text_link', 'url': 'tg://meta/eyJrZXkiOiJvbGQifQ=='}]
+    ctx = preprocessor(
+        bot, {'callback_query': dict(callback_query, message=dict(message, entities=entities))})
+    assert ctx.text == ''
+    assert ctx.meta == {'key': 'old'}
+
 
 def test_inline_query():
     """Verify Preprocessor and Context handle InlineQuery updates correctly."""
@@ -156,6 +215,79 @@ send_message(chat_id=2000, reply_parameters={'message_id': 3000, 'chat_id': 2000
 send_message(chat_id=2000, reply_markup={'inline_keyboard': [[{'text': "Resend '/test • message' in private", 'url': 'https://t.me/user"name?start=L3Rlc3Qg4oCiIG1lc3NhZ2U'}]]}, reply_parameters={'message_id': 3000, 'chat_id': 2000, 'allow_sending_without_reply': True}, text="That's too noisy to answer here. I tried to reply in private, but I can only send you a message if you already have a private chat open with me… and it looks like you don't 😞\\n\\nClick my name/picture, then the 💬 icon, then retype your command there; or click the button below and your Telegram app will do all that automatically.\\n\\n(I'll delete this in a minute.)")"""
 
 
+def test_message_group_unreachable():
+    """Verify users who can't be messaged privately skip straight to the group fallback."""
+
+    class MockAutoDelete:  # pylint: disable=missing-docstring,too-few-public-methods
+
+        def __init__(self):
+            self.pending = []
+
+        def add(self, unused_bot, chat_id, message_id, delay):
+            self.pending.append((chat_id, message_id, delay))
+
+    bot = MockBot()
+    autodelete = MockAutoDelete()
+    preprocessor = ntelebot.preprocess.Preprocessor(autodelete=autodelete)
+
+    user = {'id': 1000}
+    chat = {'id': 2000, 'type': 'supergroup'}
+    message = {'message_id': 3000, 'chat': chat, 'from': user, 'text': '/test'}
+    ctx = preprocessor(bot, {'message': message})
+    ctx.private = True
+
+    bot.unauthorized.add(user['id'])
+    ctx.reply_text('response')
+    assert bot.log.startswith("send_message(chat_id=2000, reply_markup=")
+    assert user['id'] in bot.unreachable
+    assert autodelete.pending == [(2000, 9999, 60)]
+
+    # Even once the user becomes reachable, the cached Forbidden avoids the private attempt...
+    bot.unauthorized.clear()
+    ctx.reply_text('response')
+    assert bot.log.startswith("send_message(chat_id=2000, reply_markup=")
+
+    # ... until they message the bot privately.
+    private = {'message_id': 4000, 'chat': {'id': 1000, 'type': 'private'}, 'from': user}
+    preprocessor(bot, {'message': private})
+    assert user['id'] not in bot.unreachable
+    ctx.reply_text('response')
+    assert bot.log.startswith("send_message(chat_id=1000, reply_parameters=")
+
+    # Blocking the bot (my_chat_member -> kicked) marks the user unreachable again, and unblocking
+    # clears it.
+    my_chat_member = {
+        'chat': {'id': 1000, 'type': 'private'},
+        'from': user,
+        'new_chat_member': {'status': 'kicked', 'user': {'id': 1234}},
+    }  # yapf: disable
+    assert preprocessor(bot, {'my_chat_member': my_chat_member}) is None
+    assert user['id'] in bot.unreachable
+    my_chat_member['new_chat_member'] = {'status': 'member', 'user': {'id': 1234}}
+    assert preprocessor(bot, {'my_chat_member': my_chat_member}) is None
+    assert user['id'] not in bot.unreachable
+
+    # A /start sent from anywhere also clears it, but not other commands that merely begin with
+    # "start" or a /start addressed to another bot.
+    bot.unreachable[user['id']] = True
+    for text in ('/startle', '/start@otherbot', '/start@otherbot payload'):
+        message = {'message_id': 3001, 'chat': chat, 'from': user, 'text': text}
+        preprocessor(bot, {'message': message})
+        assert user['id'] in bot.unreachable
+    for text in ('/start', '/start payload', f'/start@{bot.username}'):
+        bot.unreachable[user['id']] = True
+        message = {'message_id': 3001, 'chat': chat, 'from': user, 'text': text}
+        preprocessor(bot, {'message': message})
+        assert user['id'] not in bot.unreachable
+
+    # A failure to acknowledge a delivered private reply in the group doesn't mark the user.
+    bot.unauthorized = {chat['id']}
+    with pytest.raises(ntelebot.errors.Forbidden):
+        ctx.reply_text('response')
+    assert bot.log.startswith('send_message(chat_id=1000, reply_parameters=')
+    assert user['id'] not in bot.unreachable
+
+
 def test_channel_post():
     """Verify Preprocessor and Context handle channel_post updates correctly."""
 
@@ -228,6 +360,17 @@ def test_message_slash_start():
     assert ctx.command == 'command'
     assert ctx.text == ''
 
+    # Commands too long for a deeplink are recovered from the bot's store.
+    bot.deeplinks = ntelebot.callbackstore.CallbackStore()
+    command = '/command ' + ' '.join(str(i * 7919) for i in range(40))
+    url = bot.encode_url(command)
+    assert url.startswith('https://t.me/user"name?start=-')
+    text = f'/start {url.split("=", 1)[1]}'
+    message = {'message_id': 2000, 'chat': chat, 'from': user, 'text': text}
+    ctx = preprocessor(bot, {'message': message})
+    assert ctx.command == 'command'
+    assert ctx.text == command.split(None, 1)[1]
+
 
 def test_message_command():
     """Verify Context extracts command strings."""
@@ -514,6 +657,35 @@ def test_new_chat_members():
     assert ctx.data == [other]
 
 
+def test_chat_member():
+    """Verify membership changes invalidate the bot's cached view of the chat."""
+
+    bot = MockBot()
+    bot.cache = ntelebot.cache.ReadThroughCache(60)
+    preprocessor = ntelebot.preprocess.Preprocessor()
+    for user_id in (1000, 5000):
+        key = ('getchatmember', -2000, user_id, '')
+        assert bot.cache.get(key, lambda: 'cached') == 'cached'
+
+    chat_member = {
+        'chat': {'id': -2000, 'type': 'supergroup'},
+        'from': {'id': 1000},
+        'new_chat_member': {'status': 'kicked', 'user': {'id': 5000}},
+    }  # yapf: disable
+    assert preprocessor(bot, {'chat_member': chat_member}) is None
+    assert bot.cache.get(('getchatmember', -2000, 1000, ''), lambda: 'refetched') == 'cached'
+    assert bot.cache.get(('getchatmember', -2000, 5000, ''), lambda: 'refetched') == 'refetched'
+
+    message = {
+        'message_id': 2000,
+        'chat': {'id': -2000, 'type': 'supergroup'},
+        'from': {'id': 1000},
+        'left_chat_member': {'id': 1000},
+    }  # yapf: disable
+    preprocessor(bot, {'message': message})
+    assert bot.cache.get(('getchatmember', -2000, 1000, ''), lambda: 'refetched') == 'refetched'
+
+
 def test_pinned_message():
     """Verify Preprocessor handles pinned_message messages correctly."""
 
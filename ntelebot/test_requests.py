@@ -0,0 +1,59 @@
+"""Tests for ntelebot.requests."""
+
+import socket
+import threading
+import time
+
+import ntelebot
+
+
+def test_interrupt(requests_mock):
+    """Verify a request blocked waiting for a response can be aborted from another thread."""
+
+    requests_mock.real_http = True
+    with socket.create_server(('127.0.0.1', 0)) as server:
+        url = f'http://127.0.0.1:{server.getsockname()[1]}/'
+        errors = []
+
+        def _request():
+            try:
+                ntelebot.requests.post(url, timeout=10)
+            except ntelebot.requests.ConnectionError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=_request)
+        thread.start()
+        time.sleep(.1)
+        start = time.monotonic()
+        ntelebot.requests.interrupt(thread.ident)
+        thread.join(5)
+        assert time.monotonic() - start < 1
+        assert len(errors) == 1
+
+    # Threads that have never made a request (or have since exited) are ignored.
+    ntelebot.requests.interrupt(threading.get_ident())
+    ntelebot.requests.interrupt(thread.ident)
+
+
+def test_thread_exit(requests_mock):
+    """Verify a thread's connections stop being tracked once it exits."""
+
+    # pylint: disable=protected-access
+    requests_mock.real_http = True
+    with socket.create_server(('127.0.0.1', 0)) as server:
+        url = f'http://127.0.0.1:{server.getsockname()[1]}/'
+        idents = []
+
+        def _request():
+            try:
+                ntelebot.requests.post(url, timeout=.1)
+            except ntelebot.requests.ReadTimeout:
+                pass
+            if threading.get_ident() in ntelebot.requests._CONNECTIONS:
+                idents.append(threading.get_ident())
+
+        thread = threading.Thread(target=_request)
+        thread.start()
+        thread.join(5)
+    assert idents
+    assert idents[0] not in ntelebot.requests._CONNECTIONS
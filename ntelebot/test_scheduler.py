@@ -0,0 +1,28 @@
+"""Tests for ntelebot.scheduler."""
+
+import threading
+import time
+
+import ntelebot
+
+
+def test_call_later():
+    """Verify callbacks are run in order, on a single thread."""
+
+    scheduler = ntelebot.scheduler.Scheduler()
+    done = threading.Event()
+    calls = []
+
+    def _record(value):
+        calls.append((value, threading.current_thread().name))
+        if len(calls) == 3:
+            done.set()
+
+    scheduler.call_later(.2, _record, 3)
+    scheduler.call_at(time.time() + .1, _record, 2)
+    scheduler.call_later(0, _record, 1)
+    assert done.wait(5)
+    assert calls == [(1, 'ntelebot.scheduler'), (2, 'ntelebot.scheduler'),
+                     (3, 'ntelebot.scheduler')]
+
+    assert ntelebot.scheduler.shared() is ntelebot.scheduler.shared()
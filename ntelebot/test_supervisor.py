@@ -0,0 +1,97 @@
+"""Tests for ntelebot.supervisor."""
+
+import os
+import threading
+import time
+
+import ntelebot
+
+
+def test_hash_ring():
+    """Verify HashRing spreads keys out, and adding a node only moves keys onto that node."""
+
+    keys = [f'{i}:token' for i in range(1000)]
+    ring = ntelebot.supervisor.HashRing(range(4))
+    assert len(ring) == 4
+    before = {key: ring.get(key) for key in keys}
+    assert min(list(before.values()).count(node) for node in range(4)) > 100
+
+    ring.add(4)
+    after = {key: ring.get(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    assert 100 < len(moved) < 400
+    assert {after[key] for key in moved} == {4}
+
+    ring.remove(4)
+    assert {key: ring.get(key) for key in keys} == before
+
+
+class MockBot:  # pylint: disable=missing-docstring,too-few-public-methods
+
+    timeout = 3
+
+    def __init__(self, token):
+        self.token = token
+        self.username = token
+
+    @staticmethod
+    def get_updates(offset=None, timeout=None):
+        _ = timeout
+        if offset is None:
+            return [{'update_id': 0, 'message': {'text': 'hi'}}]
+        time.sleep(.05)
+        return []
+
+
+def _dispatcher_factory():
+    return lambda bot, update: None
+
+
+def _wait_for(supervisor, **expected):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        metrics = supervisor.metrics()
+        if all(metrics.get(key) == value for key, value in expected.items()):
+            return metrics
+        time.sleep(.05)
+    return supervisor.metrics()
+
+
+def test_supervisor(monkeypatch):
+    """Verify tokens are spread across workers, and crashed workers are restarted."""
+
+    monkeypatch.setattr(ntelebot.supervisor.Supervisor, 'RESTART_DELAY', 0)
+    tokens = [f'{i}:token' for i in range(6)]
+    supervisor = ntelebot.supervisor.Supervisor(_dispatcher_factory,
+                                                tokens=tokens[:4],
+                                                processes=2,
+                                                bot_factory=MockBot,
+                                                report_interval=.05)
+    thread = threading.Thread(target=supervisor.run, args=(.05,))
+    thread.start()
+    try:
+        metrics = _wait_for(supervisor, bots=4, dispatched=4)
+        assert metrics['bots'] == 4 and metrics['dispatched'] == 4
+
+        supervisor.add(tokens[4])
+        supervisor.add(tokens[5])
+        supervisor.remove(tokens[0])
+        metrics = _wait_for(supervisor, bots=5, dispatched=6)
+        assert metrics['bots'] == 5 and metrics['dispatched'] == 6
+
+        victim = supervisor.workers[supervisor.ring.get(tokens[1])]
+        pid = victim.process.pid
+        os.kill(pid, 9)
+        victim.process.join()
+        metrics = _wait_for(supervisor, bots=5, restarts=1)
+        assert metrics['bots'] == 5 and metrics['restarts'] == 1
+        assert victim.process.pid != pid
+
+        supervisor.resize(3)
+        metrics = _wait_for(supervisor, bots=5, processes=3)
+        assert metrics['bots'] == 5
+        assert sum(len(worker.tokens) for worker in supervisor.workers.values()) == 5
+    finally:
+        supervisor.stop()
+        thread.join()
+    assert not any(worker.process.is_alive() for worker in supervisor.workers.values())